@@ -0,0 +1,148 @@
+"""Correlation cube between disaster counts and temperature change, with bootstrap confidence intervals.
+
+Provinces from disaster.geojson are joined to their temperature series, aggregated to regions, and
+correlated per disaster type, temperature metric and island group. Bootstrap resampling is spread over
+a process pool and the result is saved as a parquet artifact keyed by a hash of its inputs. Pages only
+ever read it; build it from the klimainsights directory (tools.prebuild and the Docker images do this):
+
+    python -m analysis.correlation --boot 10000 --workers 8
+"""
+import argparse
+import hashlib
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from scipy.stats import rankdata
+
+from analysis.warming import warming_trends
+from utils.datasets import artifacts_folder
+from utils.metrics import group_metrics, ISLAND_GROUPS
+
+DISASTER_METRICS = group_metrics('disaster/Province')
+DISASTER_COLUMNS = [metric['column'] for metric in DISASTER_METRICS]
+TEMPERATURE_METRICS = {
+    'warming_rate': 'Warming Rate (°C/decade)',
+    '2020s_value': 'Avg Temperature in the 2020s',
+    '2020s_TempDiff': 'Temp Increase Since 1960s',
+}
+MIN_UNITS = 4
+
+# Join
+def province_table(disaster_gdf, temperature_gdf):
+    temperature = temperature_gdf.drop(columns=['geometry'])
+    temperature['warming_rate'] = warming_trends(temperature_gdf)['slope']
+    return pd.merge(disaster_gdf.drop(columns=['geometry'])[['Area Name', 'Region', 'Island Group', *DISASTER_COLUMNS]],
+                    temperature[['name', *TEMPERATURE_METRICS]],
+                    left_on='Area Name', right_on='name').drop(columns=['name'])
+
+def region_table(provinces):
+    return provinces.groupby(['Island Group', 'Region']).agg(
+        {**{col: 'sum' for col in DISASTER_COLUMNS}, **{col: 'mean' for col in TEMPERATURE_METRICS}}).reset_index()
+
+# Statistics
+def spearman(x, y):
+    """Rank correlation of every column of x with every column of y along axis -2, batched over leading axes."""
+    rx = rankdata(x, axis=-2)
+    ry = rankdata(y, axis=-2)
+    rx -= rx.mean(axis=-2, keepdims=True)
+    ry -= ry.mean(axis=-2, keepdims=True)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        cov = np.einsum('...nk,...nm->...km', rx, ry)
+        scale = np.sqrt(np.einsum('...nk,...nk->...k', rx, rx))[..., :, None] * np.sqrt(np.einsum('...nm,...nm->...m', ry, ry))[..., None, :]
+        return cov / scale
+
+def bootstrap_chunk(x, y, n_boot, seed):
+    rng = np.random.default_rng(seed)
+    samples = rng.integers(0, len(x), size=(n_boot, len(x)))
+    return spearman(x[samples], y[samples])
+
+def correlation_cube(provinces, n_boot=2000, workers=None, seed=101, confidence=0.95, mp_context=None):
+    """Spearman correlation and percentile bootstrap CI per division, island group, disaster type and temperature metric."""
+    groups = []
+    for division, table in [('Province', provinces), ('Region', region_table(provinces))]:
+        for island_group in ['All', *ISLAND_GROUPS]:
+            subset = table if island_group == 'All' else table[table['Island Group'] == island_group]
+            if len(subset) >= MIN_UNITS:
+                groups.append((division, island_group,
+                               subset[DISASTER_COLUMNS].to_numpy(dtype=float),
+                               subset[list(TEMPERATURE_METRICS)].to_numpy(dtype=float)))
+
+    workers = workers or os.cpu_count() or 1
+    chunks = max(1, workers)
+    chunk_sizes = [n_boot // chunks + (i < n_boot % chunks) for i in range(chunks)]
+    seeds = np.random.SeedSequence(seed).spawn(len(groups) * chunks)
+    jobs = [(g, x, y, size, seeds[g * chunks + i])
+            for g, (_, _, x, y) in enumerate(groups) for i, size in enumerate(chunk_sizes) if size]
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=mp_context) as pool:
+            results = list(pool.map(bootstrap_chunk, *zip(*[job[1:] for job in jobs])))
+    else:
+        results = [bootstrap_chunk(*job[1:]) for job in jobs]
+
+    tail = (1 - confidence) / 2 * 100
+    rows = []
+    for g, (division, island_group, x, y) in enumerate(groups):
+        boot = np.concatenate([result for job, result in zip(jobs, results) if job[0] == g])
+        r = spearman(x, y)
+        with np.errstate(invalid='ignore'):
+            low, high = np.nanpercentile(boot, [tail, 100 - tail], axis=0)
+        for k, disaster in enumerate(DISASTER_METRICS):
+            for m, metric in enumerate(TEMPERATURE_METRICS):
+                rows.append({'division': division, 'island_group': island_group,
+                             'disaster_type': disaster['id'], 'temperature_metric': metric,
+                             'n': len(x), 'r': r[k, m], 'ci_low': low[k, m], 'ci_high': high[k, m]})
+    return pd.DataFrame(rows)
+
+# Artifact
+def artifact_path(provinces):
+    # The disaster type ids are stored in the cube, so renaming one in the registry rebuilds it too
+    source = pd.util.hash_pandas_object(provinces, index=False).to_numpy().tobytes()
+    ids = ','.join(metric['id'] for metric in DISASTER_METRICS).encode()
+    source_hash = hashlib.sha1(source + ids).hexdigest()[:12]
+    return artifacts_folder / f'disaster_temperature_correlation_{source_hash}.parquet'
+
+def save_correlation_cube(cube, path):
+    """Write the cube to a temporary file next to path and rename it into place, so readers never see a partial file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, scratch = tempfile.mkstemp(dir=path.parent, suffix='.parquet.tmp')
+    os.close(fd)
+    try:
+        cube.to_parquet(scratch, index=False)
+        os.replace(scratch, path)
+    finally:
+        if os.path.exists(scratch):
+            os.remove(scratch)
+
+def build_correlation_cube(disaster_gdf, temperature_gdf, **kwargs):
+    """Compute the cube for these inputs and save it as their artifact, returning its path."""
+    provinces = province_table(disaster_gdf, temperature_gdf)
+    path = artifact_path(provinces)
+    save_correlation_cube(correlation_cube(provinces, **kwargs), path)
+    return path
+
+def load_correlation_cube(disaster_gdf, temperature_gdf):
+    """Read the cube built for these inputs, or None if it has not been built yet."""
+    path = artifact_path(province_table(disaster_gdf, temperature_gdf))
+    if path.exists():
+        return pd.read_parquet(path)
+    return None
+
+def main():
+    from utils.datasets import read_dataset
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--boot', type=int, default=2000, help='Number of bootstrap resamples per group')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: CPU count)')
+    parser.add_argument('--seed', type=int, default=101)
+    args = parser.parse_args()
+
+    path = build_correlation_cube(read_dataset('disaster'), read_dataset('temperature'),
+                                  n_boot=args.boot, workers=args.workers, seed=args.seed)
+    print(f'Wrote {len(pd.read_parquet(path))} correlations to {path}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+# Warming Trend Analytics
+# Least-squares trend of every location's temperature series, computed in one vectorized pass over the
+# locations x time matrix. Missing observations are masked rather than dropped, so yearly or monthly
+# series with gaps work the same as the complete decade series.
+import numpy as np
+import pandas as pd
+from scipy import stats
+
+def linear_trends(y, x, confidence=0.95):
+    """Slope, standard error and confidence bounds for each row of y (locations x time) against x."""
+    y = np.asarray(y, dtype=float)
+    x = np.broadcast_to(np.asarray(x, dtype=float), y.shape)
+    mask = ~np.isnan(y)
+    n = mask.sum(axis=1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = np.where(mask, x, 0).sum(axis=1) / n
+        y_mean = np.where(mask, y, 0).sum(axis=1) / n
+        dx = np.where(mask, x - x_mean[:, None], 0)
+        dy = np.where(mask, y - y_mean[:, None], 0)
+        sxx = (dx * dx).sum(axis=1)
+        slope = (dx * dy).sum(axis=1) / sxx
+        residuals = np.where(mask, dy - slope[:, None] * dx, 0)
+        stderr = np.sqrt((residuals * residuals).sum(axis=1) / (n - 2) / sxx)
+        margin = stats.t.ppf((1 + confidence) / 2, n - 2) * stderr
+
+    return pd.DataFrame({
+        'slope': slope,
+        'stderr': stderr,
+        'ci_low': slope - margin,
+        'ci_high': slope + margin,
+        'n_obs': n,
+    })
+
+def decade_matrix(temperature_gdf):
+    """Decade labels and the province x decade matrix of average temperatures."""
+    value_cols = [col for col in temperature_gdf.columns if col.endswith('_value')]
+    decades = [col[:-len('_value')] for col in value_cols]
+    return decades, temperature_gdf[value_cols].to_numpy(dtype=float)
+
+def warming_trends(temperature_gdf):
+    """Per-province warming rate in °C per decade, with its 95% confidence interval and rank."""
+    decades, y = decade_matrix(temperature_gdf)
+    trends = linear_trends(y, np.arange(len(decades)))
+    trends.index = temperature_gdf.index
+    trends.insert(0, 'name', temperature_gdf['name'])
+    trends.insert(1, 'island_group', temperature_gdf['island_group'])
+    trends.insert(2, 'Region', temperature_gdf['Region'])
+    trends['rank'] = trends['slope'].rank(ascending=False, method='min').astype('Int64')
+    return trends
@@ -0,0 +1,135 @@
+# Read-only Data Export API
+# Serves filtered slices of the shared tables the pages already read from as CSV, JSON or Arrow IPC.
+# Rows are serialized and streamed in chunks, and ETags are derived from per-row content hashes so a
+# client can revalidate without the server serializing anything.
+#
+#   GET /api/v1/                                        list tables, columns and filters
+#   GET /api/v1/temperature?island_group=Luzon&decade=1960s&decade=2020s&format=csv
+import hashlib
+import io
+import sys
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from flask import Blueprint, Response, abort, jsonify, request
+
+CHUNK_ROWS = 5000
+
+# Each table points at a page's module-level SharedTable; filters map query parameters to its columns.
+# 'published' names a list of the columns to publish, leaving out columns the page derived itself.
+TABLES = {
+    'temperature': {
+        'module': 'pages.temperature',
+        'table': 'temp_melted_table',
+        'filters': {'island_group': 'island_group', 'region': 'Region', 'province': 'name', 'decade': 'decade'},
+    },
+    'disaster': {
+        'module': 'pages.disaster',
+        'table': 'Region_table',
+        'published': 'disaster_columns',
+        'filters': {'island_group': 'Island Group', 'region': 'Region', 'province': 'Area Name'},
+    },
+    'biodiversity': {
+        'module': 'pages.biodiversity',
+        'table': 'biodiversity_table',
+        'filters': {'island_group': 'island_group', 'province': 'name'},
+    },
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'json': 'application/json',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+export_api = Blueprint('export_api', __name__, url_prefix='/api/v1')
+
+_prepared = {}
+
+def prepare(table):
+    """Resolve a table's SharedTable and cache its columns, per-row content hashes and Arrow schema."""
+    if table not in _prepared:
+        spec = TABLES[table]
+        module = sys.modules[spec['module']]
+        store = getattr(module, spec['table'])
+        columns = getattr(module, spec['published']) if 'published' in spec else store.columns
+        # Hashed chunk by chunk so the whole table is never copied out of the store at once
+        row_hashes = [pd.util.hash_pandas_object(store.frame(columns, slice(start, start + CHUNK_ROWS)), index=False).to_numpy()
+                      for start in range(0, len(store), CHUNK_ROWS)]
+        _prepared[table] = {
+            'table': store,
+            'columns': columns,
+            'row_hashes': np.concatenate(row_hashes) if row_hashes else np.empty(0, dtype=np.uint64),
+            'schema': pa.Schema.from_pandas(store.frame(columns, slice(0, CHUNK_ROWS)), preserve_index=False),
+        }
+    return _prepared[table]
+
+def select_rows(table, prepared, args):
+    store = prepared['table']
+    mask = np.ones(len(store), dtype=bool)
+    for param in args:
+        if param == 'format':
+            continue
+        if param not in TABLES[table]['filters']:
+            abort(400, f'Unsupported filter for {table}: {param}')
+        mask &= store.isin(TABLES[table]['filters'][param], args.getlist(param))
+    return mask.nonzero()[0]
+
+def chunks(prepared, rows):
+    for start in range(0, len(rows), CHUNK_ROWS):
+        yield prepared['table'].frame(prepared['columns'], rows[start:start + CHUNK_ROWS])
+
+# Serializers
+def stream_csv(prepared, rows):
+    yield pd.DataFrame(columns=prepared['columns']).to_csv(index=False)
+    for chunk in chunks(prepared, rows):
+        yield chunk.to_csv(index=False, header=False)
+
+def stream_json(prepared, rows):
+    yield '['
+    separator = ''
+    for chunk in chunks(prepared, rows):
+        yield separator + chunk.to_json(orient='records')[1:-1]
+        separator = ','
+    yield ']'
+
+def stream_arrow(prepared, rows):
+    sink = io.BytesIO()
+    with pa.ipc.new_stream(sink, prepared['schema']) as writer:
+        for chunk in chunks(prepared, rows):
+            writer.write_batch(pa.RecordBatch.from_pandas(chunk, schema=prepared['schema'], preserve_index=False))
+            yield sink.getvalue()
+            sink.seek(0)
+            sink.truncate()
+    yield sink.getvalue()
+
+SERIALIZERS = {'csv': stream_csv, 'json': stream_json, 'arrow': stream_arrow}
+
+# Routes
+@export_api.route('/')
+def list_tables():
+    return jsonify({table: {'columns': prepare(table)['columns'],
+                            'filters': list(spec['filters']),
+                            'formats': list(FORMATS)}
+                    for table, spec in TABLES.items()})
+
+@export_api.route('/<table>')
+def export_table(table):
+    if table not in TABLES:
+        abort(404, f'Unknown table: {table}')
+    data_format = request.args.get('format', 'csv')
+    if data_format not in FORMATS:
+        abort(400, f'Unsupported format: {data_format}')
+
+    prepared = prepare(table)
+    rows = select_rows(table, prepared, request.args)
+    etag = hashlib.sha1(prepared['row_hashes'][rows].tobytes() + data_format.encode()).hexdigest()
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        response = Response(SERIALIZERS[data_format](prepared, rows), mimetype=FORMATS[data_format])
+        response.headers['Content-Disposition'] = f'inline; filename={table}.{data_format}'
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
@@ -1,9 +1,24 @@
+import os
 from dash import Dash, html, page_container
+from flask import Flask
 import dash_bootstrap_components as dbc
+from environment.settings import CACHE_TYPE, CACHE_DIR, CACHE_REDIS_URL, CACHE_DEFAULT_TIMEOUT, MAP_BASEMAP
+from utils.cache import cache
 
 APP_TITLE = "Klima Insights"
 
+server = Flask(__name__)
+cache.init_app(server, config={
+    'CACHE_TYPE': CACHE_TYPE,
+    # Cached map figures embed their basemap, so figures built for another basemap are kept apart
+    'CACHE_DIR': os.path.join(CACHE_DIR, MAP_BASEMAP) if CACHE_DIR else None,
+    'CACHE_KEY_PREFIX': f'{MAP_BASEMAP}_',
+    'CACHE_REDIS_URL': CACHE_REDIS_URL,
+    'CACHE_DEFAULT_TIMEOUT': CACHE_DEFAULT_TIMEOUT,
+})
+
 app = Dash(__name__,
+            server=server,
             title=APP_TITLE,
             update_title='Loading...',
             suppress_callback_exceptions=True,
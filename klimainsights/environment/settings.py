@@ -9,4 +9,23 @@ VERSION = os.environ.get("VERSION")
 APP_HOST = os.environ.get("HOST")
 APP_PORT = os.environ.get("PORT")
 APP_DEBUG = bool(os.environ.get("DEBUG"))
-MAPBOX_TOKEN = os.environ.get("MAPBOX_TOKEN")
\ No newline at end of file
+MAPBOX_TOKEN = os.environ.get("MAPBOX_TOKEN")
+# Serve the /_debug/memory reports; they run page callbacks on request, so keep this off in deployments
+MEMORY_DEBUG_ROUTES = bool(os.environ.get("MEMORY_DEBUG_ROUTES"))
+# Choropleth layers with more features than the budget are aggregated or drawn as markers until zoomed in
+MAP_FEATURE_BUDGET = int(os.environ.get("MAP_FEATURE_BUDGET") or 1000)
+MAP_ZOOM_THRESHOLD = float(os.environ.get("MAP_ZOOM_THRESHOLD") or 7)
+
+# Figure cache (flask-caching); use FileSystemCache or RedisCache to share it between gunicorn workers
+CACHE_TYPE = os.environ.get("CACHE_TYPE") or "SimpleCache"
+CACHE_DIR = os.environ.get("CACHE_DIR")
+CACHE_REDIS_URL = os.environ.get("CACHE_REDIS_URL")
+CACHE_DEFAULT_TIMEOUT = int(os.environ.get("CACHE_DEFAULT_TIMEOUT") or 3600)
+# Warm the figure of every dropdown combination in the background after startup, not just the defaults
+PREFETCH_ALL_INPUTS = bool(os.environ.get("PREFETCH_ALL_INPUTS"))
+# Basemap under every map: "mapbox" (MAPBOX_STYLE, needs MAPBOX_TOKEN), "tiles" (raster tiles served by the
+# app from MAP_TILES_DIR/{z}/{x}/{y}.png), "outline" (land outline served by the app) or "blank" (plain white)
+MAP_BASEMAP = os.environ.get("MAP_BASEMAP") or "mapbox"
+MAPBOX_STYLE = os.environ.get("MAPBOX_STYLE") or "streets"
+MAP_TILES_DIR = os.environ.get("MAP_TILES_DIR") or "data/tiles"
+MAP_TILES_MAX_AGE = int(os.environ.get("MAP_TILES_MAX_AGE") or 30 * 24 * 3600)
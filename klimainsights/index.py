@@ -1,8 +1,12 @@
-from dash import Dash, html, page_container
+from dash import Dash, html, dcc, page_container
 import dash_bootstrap_components as dbc
 
 from app import app
-from environment.settings import APP_HOST, APP_PORT, APP_DEBUG
+from environment.settings import APP_HOST, APP_PORT, APP_DEBUG, MEMORY_DEBUG_ROUTES
+from api.export import export_api
+from utils.prefetch import register_readiness_route, start_warmup
+from utils.locate import location_search
+from utils.basemap import register_basemap_routes
 
 server = app.server
 
@@ -11,6 +15,7 @@ def serve_content():
             dbc.NavItem(dbc.NavLink("Climate History", href="/temperature")),
             dbc.NavItem(dbc.NavLink("Biodiversity Insights", href="/biodiversity")),
             dbc.NavItem(dbc.NavLink("Disaster Occurrences", href="/disaster")),
+            location_search(),
     ])
 
     return html.Main(id='main', children=[
@@ -34,11 +39,21 @@ def serve_content():
                     html.I()
                 ]),
             navbar,
+            dcc.Location(id='url'),
+            dcc.Store(id='prefetch-store'),
             page_container
     ])
 
 app._favicon = ("icon.svg")
 app.layout = serve_content()
+server.register_blueprint(export_api)
+register_readiness_route(server)
+register_basemap_routes(server)
+start_warmup()
+
+if MEMORY_DEBUG_ROUTES:
+    from tools.memory import register_memory_routes
+    register_memory_routes(server)
 
 if __name__ == '__main__':
     app.run_server(debug=APP_DEBUG, host=APP_HOST, port=APP_PORT)
\ No newline at end of file
@@ -1,43 +1,41 @@
 # Setup Folders, Tokens, and Dependencies
-from dash import html, dcc, callback, Output, Input, register_page
+from dash import html, dcc, callback, Output, Input, State, register_page
 import dash_bootstrap_components as dbc
 import plotly.express as px
-import pandas as pd
-import geopandas as gpd
 import dash_daq as daq
-from pathlib import Path
 from environment.settings import MAPBOX_TOKEN
+from utils.datasets import read_dataset, melt_temperature
+from utils.shared_store import open_table
+from utils.cache import cache
+from utils.basemap import apply_basemap
+from utils.metrics import resolve, metric_ids, group_metrics, set_ranges, ISLAND_GROUPS
 
-datasets_folder = Path('./data')
 px.set_mapbox_access_token(MAPBOX_TOKEN)
 
 # Import Data
-biodiversity_gdf = gpd.read_file(datasets_folder / 'biodiversity.geojson')
-temperature_gdf = gpd.read_file(datasets_folder / 'temperature.geojson')
+biodiversity_gdf = read_dataset('biodiversity')
+temperature_gdf = read_dataset('temperature')
 biodiversity_gdf = biodiversity_gdf.rename(columns={"Critically Endangered": "Critical"})
 
-melt_value = temperature_gdf.drop(columns=[col for col in temperature_gdf.columns if 'TempDiff' in col])
-melt_value.columns = [col.split('_')[0] if '_value' in col else col for col in melt_value.columns]
-melt_value = melt_value.melt(id_vars=['name', 'geometry', 'admin_div', 'island_group', 'Region'], 
-                            var_name='decade', 
-                            value_name='value')
-melt_tempdiff = temperature_gdf.drop(columns=[col for col in temperature_gdf.columns if 'value' in col])
-melt_tempdiff.columns = [col.split('_')[0] if '_TempDiff' in col else col for col in melt_tempdiff.columns]
-melt_tempdiff = melt_tempdiff.melt(id_vars=['name', 'geometry', 'admin_div', 'island_group', 'Region'], 
-                            var_name='decade', 
-                            value_name='TempDiff')
-temp_melted_gdf = pd.merge(melt_value, melt_tempdiff, on=['name', 'geometry', 'admin_div', 'island_group', 'Region', 'decade'])
+biodiversity_table = open_table('biodiversity', biodiversity_gdf.drop(columns=['geometry']), lambda: biodiversity_gdf.drop(columns=['geometry']))
+biodiversity_gdf = biodiversity_gdf[['name', 'island_group', 'area_type', 'geometry']]
+temp_melted_table = open_table('temp_melted', temperature_gdf.drop(columns=['geometry']), lambda: melt_temperature(temperature_gdf))
+set_ranges('biodiversity', biodiversity_table, by='island_group')
 
 # Initialize Page
 register_page(__name__, path='/biodiversity', name='Biodiversity', title='Biodiversity Insights')
 
-layout = dbc.Container(className="d-flex justify-content-center align-items-center full-width my-3 z-3", fluid=True, children=[
+# ?province= (from the location search in the navbar) opens that province's island group and temperature line
+def layout(province=None, **kwargs):
+  selected = biodiversity_gdf[biodiversity_gdf['name'] == province]
+  region = selected['island_group'].iloc[0] if len(selected) else 'Luzon'
+  return dbc.Container(className="d-flex justify-content-center align-items-center full-width my-3 z-3", fluid=True, children=[
     dbc.Row(className="align-items-stretch", children=[
         dbc.Col(className="bg-light rounded z-3 d-flex flex-col justify-content-center align-items-center", width=12, md=4, children=[
             html.Div(className='full-width-container text-dark', children=[
                 daq.BooleanSwitch(
                                 id='bio-switch',
-                                on=False,
+                                on=bool(len(selected)),
                                 color="#b58900",
                                 label="Show Avg Temp Increase Per Province",
                             ),
@@ -48,10 +46,7 @@ layout = dbc.Container(className="d-flex justify-content-center align-items-cent
                     "Discover the rich biodiversity of the Philippines and understand its distribution across different regions. Use the selector to filter by geographic region and explore the geospatial distribution of biodiversity as well as the composition of endangered species."
                 ]),
                 html.Div(className='w-100', children=[
-                        dcc.Dropdown(options=[{'label': 'Total', 'value': 'total_species'},
-                                {'label': 'Critically Endangered', 'value': 'Critical'},
-                                {'label': 'Endangered', 'value': 'Endangered'},
-                                {'label': 'Vulnerable', 'value': 'Vulnerable'}],
+                        dcc.Dropdown(options=[{'label': metric['label'], 'value': metric['id']} for metric in group_metrics('biodiversity')],
                                 value='total_species', id='species-dropdown', 
                                 multi=False, searchable=False, clearable=False)
                 ]),
@@ -62,10 +57,11 @@ layout = dbc.Container(className="d-flex justify-content-center align-items-cent
             html.Div(className="text-dark z-3 align-self-start", children=[
                 html.Div(className='d-flex flex-row justify-content-between align-items-center', children=[
                     html.Div(className='w-100', children=[
-                        dcc.Dropdown(options=['Luzon', 'Visayas', 'Mindanao'], value='Luzon', id='region-dropdown', multi=False, searchable=False, clearable=False)
+                        dcc.Dropdown(options=ISLAND_GROUPS, value=region, id='region-dropdown', multi=False, searchable=False, clearable=False)
                     ])
                 ]),
                 html.Div(children=[
+                    dcc.Store(id='bio-province', data=province if len(selected) else None),
                     dcc.Loading(type="circle", children=[dcc.Graph(id="endangered-species-bar")])
                 ])
             ])
@@ -78,13 +74,18 @@ layout = dbc.Container(className="d-flex justify-content-center align-items-cent
     Output('biodiversity-choropleth', 'figure'),
     [Input('region-dropdown', 'value'), Input('species-dropdown', 'value')]
 )
+@cache.memoize()
 def update_choropleth(region, species_type):
+    metric = resolve('biodiversity', species_type)
+    if metric is None:
+        return
     # if region == "Sea":
     #     filtered_data = biodiversity_gdf[(biodiversity_gdf['area_type'].isin(['Sea']))].reset_index().drop(columns='index')
     #     cen = {"lat": 12.8797, "lon": 122.7740}
     #     zum = 4
     # else:
-    filtered_data = biodiversity_gdf[biodiversity_gdf['island_group'] == region].reset_index().drop(columns='index')
+    rows = biodiversity_table.isin('island_group', [region])
+    filtered_data = biodiversity_gdf[rows].assign(**{metric['column']: biodiversity_table.column(metric['column'], rows)}).reset_index().drop(columns='index')
     if region == "Luzon":
         cen = {"lat": filtered_data.geometry.centroid.y.values[0]-2.5, "lon": filtered_data.geometry.centroid.x.values[0]}
         zum = 5
@@ -95,23 +96,20 @@ def update_choropleth(region, species_type):
         cen = {"lat": filtered_data.geometry.centroid.y.values[0]-1, "lon": filtered_data.geometry.centroid.x.values[0]-1}
         zum = 5.5
     
-    if species_type == "total_species":
-        txt = "Total"
-    else:
-        txt = species_type
+    txt = metric['short_label']
     # Create choropleth map using Plotly Express
     choropleth_fig = px.choropleth_mapbox(filtered_data,
                                             height=500,
                                            geojson=filtered_data.geometry,
                                            locations=filtered_data.index,
-                                           color=species_type,  # Change based on biodiversity metric
-                                           color_continuous_scale='dense',
-                                           range_color=[filtered_data[species_type].min(), filtered_data[species_type].max()],
-                                           mapbox_style='streets',
+                                           color=metric['column'],  # Change based on biodiversity metric
+                                           color_continuous_scale=metric['colorscale'],
+                                           range_color=metric['ranges'][region],
                                            zoom=zum,
                                            center=cen,
                                            opacity=0.6
                                            )
+    apply_basemap(choropleth_fig)
     choropleth_fig.update_layout(margin=dict(l=0, r=0, t=0, b=0))
     choropleth_fig.update_layout(coloraxis_colorbar=dict(title= txt + " Species Count", yanchor="top", xanchor='left',
                                                           y=1, x=0, ticks="outside", ticklabelposition="outside left",
@@ -122,86 +120,107 @@ def update_choropleth(region, species_type):
 
     hover_template = '<b>%{customdata[0]}</b><br>' + txt + ' Count: %{z:.0f}<extra></extra>'
     choropleth_fig.update_traces(hovertemplate=hover_template,
-                                 customdata=filtered_data[['name', species_type]])
+                                 customdata=filtered_data[['name', metric['column']]])
     return choropleth_fig
 
 # Bar Figure
 @callback(
     Output('endangered-species-bar', 'figure'),
-    [Input('region-dropdown', 'value'), Input('bio-switch', 'on'), Input('biodiversity-choropleth', 'clickData')]
+    [Input('region-dropdown', 'value'), Input('bio-switch', 'on'), Input('biodiversity-choropleth', 'clickData')],
+    State('bio-province', 'data')
 )
-def update_bar(region, bio_switch, click_data):
+def update_bar(region, bio_switch, click_data, province=None):
+    # The figures are cached by province name, not by the raw clickData (which carries pixel positions)
+    if not bio_switch:
+        return species_bar(region)
+    if click_data is not None:
+        province = click_data['points'][0]['customdata'][0]
+    return province_line(region, province)
+
+def land_provinces(region):
     # if region == "Sea":
     #     filtered_data = biodiversity_gdf[(biodiversity_gdf['area_type'].isin(['Sea']))].reset_index().drop(columns='index')
     # else:
-    
-    filtered_data = biodiversity_gdf[(biodiversity_gdf['area_type'].isin(['Land'])) & (biodiversity_gdf['island_group'].isin([region]))].sort_values(by='total_species', ascending=True, ignore_index=True)
-    
-    if bio_switch:
-        if click_data is not None:
-            data = click_data['points'][0]['customdata'][0] 
-        else:
-            data = filtered_data['name'].iloc[-1]
+    return biodiversity_table.frame(rows=biodiversity_table.isin('area_type', ['Land']) & biodiversity_table.isin('island_group', [region])).sort_values(by='total_species', ascending=True, ignore_index=True)
 
-        island_gdf = temp_melted_gdf[(temp_melted_gdf['name'].isin([data]) == True)].drop(columns=['geometry'])
-        line_fig = px.line(island_gdf, x='decade', y='value',color='name')
-        line_fig.update_layout(
-            autosize=True,  
-            height=750,
-            title='Change in Avg Temperature in ' + data,
-            yaxis=dict(
-                range=[25, 32],
-                tickmode='linear',
-                dtick=0.5
-            ),
-            margin=dict(l=20, r=20, t=100, b=100),
-            updatemenus=[{
-                'direction': 'left',  
-                'pad': {'t': 0, 'b': 0, 'l': 0, 'r': 0},  
-                'showactive': False,
-                'type': 'buttons',
-                'x': 0.06,  
-                'xanchor': 'right',
-                'y': -0.46,  
-                'yanchor': 'top'
-            }],
-            xaxis_tickangle=-45 
-        )
-        hover_template = '<b>' + data + '</b><br>Average Temperature in<br>the %{x}:<br>%{y:.2f}°C<extra></extra>'
-        line_fig.update_traces(hovertemplate=hover_template)
+@cache.memoize()
+def province_line(region, data=None):
+    if data is None:
+        data = land_provinces(region)['name'].iloc[-1]
 
-        return line_fig
+    island_gdf = temp_melted_table.frame(rows=temp_melted_table.isin('name', [data]))
+    line_fig = px.line(island_gdf, x='decade', y='value',color='name')
+    line_fig.update_layout(
+        autosize=True,  
+        height=750,
+        title='Change in Avg Temperature in ' + data,
+        yaxis=dict(
+            range=[25, 32],
+            tickmode='linear',
+            dtick=0.5
+        ),
+        margin=dict(l=20, r=20, t=100, b=100),
+        updatemenus=[{
+            'direction': 'left',  
+            'pad': {'t': 0, 'b': 0, 'l': 0, 'r': 0},  
+            'showactive': False,
+            'type': 'buttons',
+            'x': 0.06,  
+            'xanchor': 'right',
+            'y': -0.46,  
+            'yanchor': 'top'
+        }],
+        xaxis_tickangle=-45 
+    )
+    hover_template = '<b>' + data + '</b><br>Average Temperature in<br>the %{x}:<br>%{y:.2f}°C<extra></extra>'
+    line_fig.update_traces(hovertemplate=hover_template)
 
-    else:
-        bar_fig = px.bar(filtered_data,
-             x=['Vulnerable', 'Endangered', 'Critical'],  
-             y='name',  
-             title='Number of Unique Species<br>at Risk in ' + region,
-             orientation='h',  
-             height=750,  
-             color_discrete_sequence=['yellow', 'orange', 'red'], 
-             )
-        bar_fig.update_layout(
-            xaxis_title='Unique Species', 
-            yaxis_title='Province',
-            legend_title='IUCN Category',
-            legend=dict(
-                x=0.99,
-                y=0.01,
-                xanchor='right',
-                yanchor='bottom',
-                traceorder='normal',
-                font=dict(
-                    family='Arial',
-                    size=12,
-                    color='black'
-                ),
-                bgcolor='rgba(255, 255, 255, 0.6)',
-                bordercolor='rgba(0, 0, 0, 0.6)',
-                borderwidth=1,
+    return line_fig
+
+@cache.memoize()
+def species_bar(region):
+    filtered_data = land_provinces(region)
+    bar_fig = px.bar(filtered_data,
+         x=['Vulnerable', 'Endangered', 'Critical'],  
+         y='name',  
+         title='Number of Unique Species<br>at Risk in ' + region,
+         orientation='h',  
+         height=750,  
+         color_discrete_sequence=['yellow', 'orange', 'red'], 
+         )
+    bar_fig.update_layout(
+        xaxis_title='Unique Species', 
+        yaxis_title='Province',
+        legend_title='IUCN Category',
+        legend=dict(
+            x=0.99,
+            y=0.01,
+            xanchor='right',
+            yanchor='bottom',
+            traceorder='normal',
+            font=dict(
+                family='Arial',
+                size=12,
+                color='black'
             ),
-            margin=dict(l=0, r=0, t=70, b=60)
-        )
-        hover_template = '<b>%{y}</b><br>Unique Species: %{x}<extra></extra>'
-        bar_fig.update_traces(hovertemplate=hover_template)
-        return bar_fig
\ No newline at end of file
+            bgcolor='rgba(255, 255, 255, 0.6)',
+            bordercolor='rgba(0, 0, 0, 0.6)',
+            borderwidth=1,
+        ),
+        margin=dict(l=0, r=0, t=70, b=60)
+    )
+    hover_template = '<b>%{y}</b><br>Unique Species: %{x}<extra></extra>'
+    bar_fig.update_traces(hovertemplate=hover_template)
+    return bar_fig
+
+# Prefetch
+def prefetch():
+    update_choropleth('Luzon', 'total_species')
+    update_bar('Luzon', False, None)
+
+def warm_inputs():
+    for region in ISLAND_GROUPS:
+        for species_type in metric_ids('biodiversity'):
+            yield update_choropleth, (region, species_type)
+        for bio_switch in [False, True]:
+            yield update_bar, (region, bio_switch, None)
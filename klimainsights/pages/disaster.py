@@ -1,112 +1,149 @@
 # Setup Folders, Tokens, and Dependencies
-from dash import html, dcc, callback, Output, Input, State, register_page
+from dash import html, dcc, callback, ctx, no_update, Output, Input, State, register_page
 import dash_bootstrap_components as dbc
 import plotly.express as px
-import pandas as pd
 import numpy as np
-import geopandas as gpd
-from pathlib import Path
 from environment.settings import MAPBOX_TOKEN
+from utils.datasets import read_dataset, melt_temperature
+from utils.shared_store import open_table
+from utils.adaptive_map import adaptive_choropleth, fits_budget, moved, focus_province
+from analysis.correlation import load_correlation_cube, TEMPERATURE_METRICS
+from utils.cache import cache, viewport_dependent
+from utils.metrics import resolve, metric_ids, group_metrics, set_ranges, ISLAND_GROUPS
 
-datasets_folder = Path('./data')
 px.set_mapbox_access_token(MAPBOX_TOKEN)
 
 # Import Data
-temperature_gdf = gpd.read_file(datasets_folder / "temperature.geojson")
-disaster_gdf = gpd.read_file(datasets_folder / 'disaster.geojson')
+temperature_gdf = read_dataset('temperature')
+disaster_gdf = read_dataset('disaster')
 Region_gdf = disaster_gdf.copy()
 Region_tot_ave = Region_gdf.drop(columns=['geometry']).groupby('Region').sum()
-def region_count(disaster_type,col_name):
+def region_count(disaster_type,col_name,region_totals):
     Region_gdf[col_name] = np.nan #Create a new column that contains the number of disasters per region
 
     for i1,r1 in Region_gdf.iterrows():
-        for i2,r2 in Region_tot_ave.iterrows():
+        for i2,r2 in region_totals.iterrows():
             if r1['Region'] == i2:
                 Region_gdf.at[i1, col_name] = r2[disaster_type]
             else:
                 continue
-region_count('Total Disaster Count','Region_tot')
-region_count('Storm Count','Region_storm')
-region_count('Flood Count','Region_flood')
-region_count('Earthquake Count','Region_earth')
-region_count('Volcanic Activity Count','Region_vol')
-region_count('Mass Movement Count','Region_mass')
-region_count('Drought Count','Region_drought')
+for spec in group_metrics('disaster/Region'):
+    region_count(spec['source'], spec['column'], Region_tot_ave)
 
-melt_value = temperature_gdf.drop(columns=[col for col in temperature_gdf.columns if 'TempDiff' in col])
-melt_value.columns = [col.split('_')[0] if '_value' in col else col for col in melt_value.columns]
-melt_value = melt_value.melt(id_vars=['name', 'geometry', 'admin_div', 'island_group', 'Region'], 
-                            var_name='decade', 
-                            value_name='value')
-melt_tempdiff = temperature_gdf.drop(columns=[col for col in temperature_gdf.columns if 'value' in col])
-melt_tempdiff.columns = [col.split('_')[0] if '_TempDiff' in col else col for col in melt_tempdiff.columns]
-melt_tempdiff = melt_tempdiff.melt(id_vars=['name', 'geometry', 'admin_div', 'island_group', 'Region'], 
-                            var_name='decade', 
-                            value_name='TempDiff')
-temp_melted_gdf = pd.merge(melt_value, melt_tempdiff, on=['name', 'geometry', 'admin_div', 'island_group', 'Region', 'decade'])
+Region_table = open_table('Region', Region_gdf.drop(columns=['geometry']), lambda: Region_gdf.drop(columns=['geometry']))
+Region_gdf = Region_gdf[['Area Name', 'Region', 'Island Group', 'geometry']]
+temp_melted_table = open_table('temp_melted', temperature_gdf.drop(columns=['geometry']), lambda: melt_temperature(temperature_gdf))
+set_ranges('disaster/Region', Region_table)
+set_ranges('disaster/Province', Region_table)
+# Built ahead of time by python -m analysis.correlation (or tools.prebuild); None until then
+correlation_df = load_correlation_cube(disaster_gdf, temperature_gdf)
+# The counts now live in Region_table; keep only the dataset's column names (published by the export API)
+disaster_columns = [col for col in disaster_gdf.columns if col != 'geometry']
+del disaster_gdf, Region_tot_ave
 
 # Initialize Page
 register_page(__name__, path='/disaster', name='Disaster', title='Klima Insights | Disaster')
 
-layout = dbc.Container(className="d-flex justify-content-center align-items-center full-width my-3 z-3", fluid=True, children=[
-  dbc.Row(className="align-items-stretch", children=[
-      dbc.Col(className="bg-light rounded z-3 d-flex flex-col justify-content-center align-items-center", width=12, md=4, children=[
-          html.Div(className='full-width-container text-dark', children=[
-              html.Div(className='d-flex flex-row justify-content-start align-items-center mt-2 flex-gap-20', children=[
-                  html.H5(className='mt-1', children=["Divide By: "]),
-                  dcc.RadioItems(id='division-radio', options=['Region', 'Province'], value='Region', inline=True, labelStyle={"margin-right": "20px"})
-              ]),
-              html.H4(className="mt-2", children=[
-                  "Unveiling the Interplay of Temperature and Disaster Vulnerability in the Philippines"
-              ]),
-              html.P(className="", children=[
-                  "The Philippines, situated along the Pacific Ring of Fire, has long been highly susceptible to a range of disasters, including seismic and volcanic events. However, it's crucial to recognize that the nation's vulnerability to such calamities is not solely attributable to its geographical location. By utilizing the dropdown menu provided, one can explore the occurrences of each disaster type. Furthermore, clicking on specific areas in the map facilitates a deeper visualization of temperature changes in those regions."
-              ]),
-              dcc.Loading(type="circle", children=[dcc.Graph(id="disaster-line")])
-          ])
-      ]),
-      dbc.Col(className="rounded z-3 disaster-map-height overflow-hidden", width=12, md=8, children=[
-          html.Div(className="text-dark z-3 align-self-start", children=[
-            html.Div(className='d-flex flex-row justify-content-between align-items-center', children=[
-              html.Div(className='w-100', children=[
-                  dcc.Dropdown(options=['Total Disaster', 'Storm', 'Flood', 'Earthquake', 'Volcanic Activity', 'Mass Movement', 'Drought'], value='Total Disaster', id='disaster-type-dropdown', multi=False, searchable=False, clearable=False)
+# Built per visit so the default map and line come from the (prefetched) figure cache. ?province= (from
+# the location search in the navbar) switches to provinces, centred on that one with its temperature line.
+def layout(province=None, **kwargs):
+  selected = Region_gdf[Region_gdf['Area Name'] == province]
+  if len(selected):
+    division = 'Province'
+    line_fig = line_figure('Province', province)
+    map_fig = focus_province(map_figure('Province', 'Total Disaster'), selected.geometry.iloc[0])
+  else:
+    division = 'Region'
+    line_fig = line_figure('Region')
+    map_fig = map_figure('Region', 'Total Disaster')
+  return dbc.Container(className="d-flex justify-content-center align-items-center full-width my-3 z-3", fluid=True, children=[
+    dbc.Row(className="align-items-stretch", children=[
+        dbc.Col(className="bg-light rounded z-3 d-flex flex-col justify-content-center align-items-center", width=12, md=4, children=[
+            html.Div(className='full-width-container text-dark', children=[
+                html.Div(className='d-flex flex-row justify-content-start align-items-center mt-2 flex-gap-20', children=[
+                    html.H5(className='mt-1', children=["Divide By: "]),
+                    dcc.RadioItems(id='division-radio', options=['Region', 'Province'], value=division, inline=True, labelStyle={"margin-right": "20px"})
+                ]),
+                html.H4(className="mt-2", children=[
+                    "Unveiling the Interplay of Temperature and Disaster Vulnerability in the Philippines"
+                ]),
+                html.P(className="", children=[
+                    "The Philippines, situated along the Pacific Ring of Fire, has long been highly susceptible to a range of disasters, including seismic and volcanic events. However, it's crucial to recognize that the nation's vulnerability to such calamities is not solely attributable to its geographical location. By utilizing the dropdown menu provided, one can explore the occurrences of each disaster type. Furthermore, clicking on specific areas in the map facilitates a deeper visualization of temperature changes in those regions."
+                ]),
+                dcc.Loading(type="circle", children=[dcc.Graph(id="disaster-line", figure=line_fig)])
+            ])
+        ]),
+        dbc.Col(className="rounded z-3 disaster-map-height overflow-hidden", width=12, md=8, children=[
+            html.Div(className="text-dark z-3 align-self-start", children=[
+              html.Div(className='d-flex flex-row justify-content-between align-items-center', children=[
+                html.Div(className='w-100', children=[
+                    dcc.Dropdown(options=metric_ids('disaster/Province'), value='Total Disaster', id='disaster-type-dropdown', multi=False, searchable=False, clearable=False)
+                ]),
+                dbc.Button("Compare", color="primary z-3", id="open-disaster-modal", n_clicks=0),
+                dbc.Button("Correlate", color="primary z-3", id="open-corr-modal", n_clicks=0)
               ]),
-              dbc.Button("Compare", color="primary z-3", id="open-disaster-modal", n_clicks=0)
-            ]),
-            html.Div(children=[
-                dcc.Loading(type="circle", children=[dcc.Graph(id="disaster-map")])
+              html.Div(children=[
+                  dcc.Loading(type="circle", children=[dcc.Graph(id="disaster-map", figure=map_fig)])
+              ])
             ])
-          ])
-      ]),
-      dbc.Modal(
-          [
-              dbc.ModalHeader(dbc.ModalTitle(className="text-secondary", children=["Disaster Count per Area"])),
-              dbc.ModalBody(children=[
-                  dbc.Row(children=[
-                      dbc.Col(width=12, md=4, children=[
-                        html.Div(children=[
-                          html.H4(className="mt-2 text-light", children=[
-                              "Deeper Insights into Disaster Trends"
-                          ]),
-                          html.P(className="text-light", children=[
-                              "Taking a closer look, we can compare the frequency of disasters in each province or region within a specific island group using the bar graph provided on the right. Noticing the disparity in disaster occurrences among different areas raises awareness of the necessity to take proactive measures, regardless of their scale, to mitigate and minimize future disasters."
-                          ]),
+        ]),
+        dbc.Modal(
+            [
+                dbc.ModalHeader(dbc.ModalTitle(className="text-secondary", children=["Disaster Count per Area"])),
+                dbc.ModalBody(children=[
+                    dbc.Row(children=[
+                        dbc.Col(width=12, md=4, children=[
+                          html.Div(children=[
+                            html.H4(className="mt-2 text-light", children=[
+                                "Deeper Insights into Disaster Trends"
+                            ]),
+                            html.P(className="text-light", children=[
+                                "Taking a closer look, we can compare the frequency of disasters in each province or region within a specific island group using the bar graph provided on the right. Noticing the disparity in disaster occurrences among different areas raises awareness of the necessity to take proactive measures, regardless of their scale, to mitigate and minimize future disasters."
+                            ]),
+                          ])
+                        ]),
+                        dbc.Col(width=12, md=8, children=[
+                          dcc.Dropdown(options=ISLAND_GROUPS, value='Luzon', id='disaster-bar-dropdown',
+                                        multi=False, searchable=False, clearable=False),
+                          dcc.Loading(type="circle", children=[dcc.Graph(id="disaster-bar")])
                         ])
-                      ]),
-                      dbc.Col(width=12, md=8, children=[
-                        dcc.Dropdown(options=['Luzon', 'Visayas', 'Mindanao'], value='Luzon', id='disaster-bar-dropdown',
-                                      multi=False, searchable=False, clearable=False),
-                        dcc.Loading(type="circle", children=[dcc.Graph(id="disaster-bar")])
-                      ])
-                  ])
-              ]),
-          ],
-          id="disaster-modal",
-          size="xl",
-          is_open=False,
-      )
+                    ])
+                ]),
+            ],
+            id="disaster-modal",
+            size="xl",
+            is_open=False,
+        ),
+        dbc.Modal(
+            [
+                dbc.ModalHeader(dbc.ModalTitle(className="text-secondary", children=["Disaster and Temperature Correlation"])),
+                dbc.ModalBody(children=[
+                    dbc.Row(children=[
+                        dbc.Col(width=12, md=4, children=[
+                          html.Div(children=[
+                            html.H4(className="mt-2 text-light", children=[
+                                "Do Warmer Areas Experience More Disasters?"
+                            ]),
+                            html.P(className="text-light", children=[
+                                "Each cell shows the rank correlation between the number of disasters and a measure of temperature change across the provinces or regions of an island group. Values near 1 mean areas that warmed more also saw more disasters, values near -1 mean the opposite. Hover over a cell to see its 95% bootstrap confidence interval; intervals that cross zero suggest no clear relationship."
+                            ]),
+                            dcc.RadioItems(id='corr-metric-radio', className="text-light",
+                                           options=[{'label': label, 'value': metric} for metric, label in TEMPERATURE_METRICS.items()],
+                                           value='warming_rate', labelStyle={"display": "block"})
+                          ])
+                        ]),
+                        dbc.Col(width=12, md=8, children=[
+                          dcc.Loading(type="circle", children=[dcc.Graph(id="disaster-corr")])
+                        ])
+                    ])
+                ]),
+            ],
+            id="corr-modal",
+            size="xl",
+            is_open=False,
+        )
+    ])
   ])
-])
 
 # Compare Modal
 @callback(
@@ -119,15 +156,30 @@ def toggle_modal(n1, is_open):
         return not is_open
     return is_open
 
+@callback(
+    Output("corr-modal", "is_open"),
+    Input("open-corr-modal", "n_clicks"),
+    State("corr-modal", "is_open"),
+)
+def toggle_corr_modal(n1, is_open):
+    if n1:
+        return not is_open
+    return is_open
+
 # Click Data
 @callback(
     Output("disaster-line", "figure"),
-    [Input('division-radio', 'value'), Input("disaster-map", "clickData")]
+    [Input('division-radio', 'value'), Input("disaster-map", "clickData")],
+    prevent_initial_call=True
 )
 def update_line(division, click_data):
-    if click_data is not None:
-      data = click_data['points'][0]['customdata'][0] 
-    else:
+    # The figure is cached by the clicked name, not by the raw clickData (which carries pixel positions)
+    name = click_data['points'][0]['customdata'][0] if click_data is not None else None
+    return line_figure(division, name)
+
+@cache.memoize()
+def line_figure(division, data=None):
+    if data is None:
       match division:
             case 'Region':
                 data = 'RegionI'
@@ -139,10 +191,14 @@ def update_line(division, click_data):
         curr_div = 'Region'
     elif division == 'Province':
         curr_div = 'name'
+        # Zoomed-out province layers over the feature budget are drawn as dissolved regions, so a click
+        # there carries the Region name
+        if not temp_melted_table.isin('name', [data]).any():
+            curr_div = 'Region'
     else:
         return
     
-    island_gdf = temp_melted_gdf[(temp_melted_gdf[curr_div].isin([data]) == True)].drop(columns=['geometry']).sort_values(by=['name', 'decade'], ascending=True, ignore_index=True)
+    island_gdf = temp_melted_table.frame(rows=temp_melted_table.isin(curr_div, [data])).sort_values(by=['name', 'decade'], ascending=True, ignore_index=True)
 
     line_fig = px.line(island_gdf, x='decade', y='value',color='name')
     line_fig.update_layout(
@@ -175,60 +231,38 @@ def update_line(division, click_data):
 # Map Figure
 @callback(
     Output('disaster-map', 'figure'),
-    [Input('division-radio', 'value'), Input('disaster-type-dropdown', 'value')]
+    [Input('division-radio', 'value'), Input('disaster-type-dropdown', 'value'), Input('disaster-map', 'relayoutData')],
+    prevent_initial_call=True
 )
-def update_map(division, disaster_type):
-    curr_division = ''
-    curr_disaster = ''
-    if division == 'Region':
-        curr_division = 'Region'
-        match disaster_type:
-            case 'Total Disaster':
-                curr_disaster = 'Region_tot'
-            case 'Storm':
-                curr_disaster = 'Region_storm'
-            case 'Flood':
-                curr_disaster = 'Region_flood'
-            case 'Earthquake':
-                curr_disaster = 'Region_earth'
-            case 'Volcanic Activity':
-                curr_disaster = 'Region_vol'
-            case 'Mass Movement':
-                curr_disaster = 'Region_mass'
-            case 'Drought':
-                curr_disaster = 'Region_drought'
-            case _:
-                return
-    elif division == 'Province':
-        curr_division = 'Area Name'
-        match disaster_type:
-            case 'Total Disaster':
-                curr_disaster = 'Total Disaster Count'
-            case 'Storm':
-                curr_disaster = 'Storm Count'
-            case 'Flood':
-                curr_disaster = 'Flood Count'
-            case 'Earthquake':
-                curr_disaster = 'Earthquake Count'
-            case 'Volcanic Activity':
-                curr_disaster = 'Volcanic Activity Count'
-            case 'Mass Movement':
-                curr_disaster = 'Mass Movement Count'
-            case 'Drought':
-                curr_disaster = 'Drought Count'
-            case _:
-                return
-    else:
+def update_map(division, disaster_type, relayout_data=None):
+    if fits_budget(Region_gdf):
+        # Panning or zooming only needs a new figure when the layer is too large to draw in full
+        if relayout_data is not None and ctx.triggered_id == 'disaster-map':
+            return no_update
+        relayout_data = None
+    elif not moved(relayout_data):
+        # The default viewport, so the cached full-extent figure
+        relayout_data = None
+    return map_figure(division, disaster_type, relayout_data)
+
+@cache.memoize(unless=viewport_dependent)
+def map_figure(division, disaster_type, relayout_data=None):
+    metric = resolve(f'disaster/{division}', disaster_type)
+    if metric is None:
         return
+    curr_division = metric['division_column']
+    curr_disaster = metric['column']
 
-    map_fig = px.choropleth_mapbox(Region_gdf,
-                                height=845,
-                                geojson=Region_gdf.geometry,
-                                locations=Region_gdf.index,
+    map_fig = adaptive_choropleth(Region_gdf,
                                 color=curr_disaster, # Change based on dropdown value
-                                color_continuous_scale='amp',
-                                range_color=[Region_gdf[curr_disaster].min(), Region_gdf[curr_disaster].max()],  
-                                mapbox_style='streets',  
+                                customdata=[curr_division, curr_disaster],
+                                relayout_data=relayout_data,
+                                values=Region_table.frame([curr_disaster]),
+                                parent='Region',
+                                aggfunc='first' if division == 'Region' else 'sum',
+                                height=845,
+                                color_continuous_scale=metric['colorscale'],
+                                range_color=metric['range'],
                                 zoom=5,  
                                 center={"lat": 12.8797, "lon": 122.7740}, 
                                 opacity=0.6,
@@ -246,8 +280,7 @@ def update_map(division, disaster_type):
 
     hover_template = '<b>%{customdata[0]}</b><br>' + disaster_type + ' Count: %{customdata[1]:.0f}<extra></extra>'
 
-    map_fig.update_traces(hovertemplate=hover_template,
-                    customdata=Region_gdf[[curr_division, curr_disaster]])
+    map_fig.update_traces(hovertemplate=hover_template)
 
     return map_fig
 
@@ -256,51 +289,18 @@ def update_map(division, disaster_type):
     Output('disaster-bar', 'figure'),
     [Input('division-radio', 'value'), Input('disaster-type-dropdown', 'value'), Input('disaster-bar-dropdown', 'value')]
 )
+@cache.memoize()
 def update_disaster_bar(division, disaster_type, island_group):
-    curr_division = ''
-    curr_disaster = ''
-    if division == 'Region':
-        curr_division = 'Region'
-        match disaster_type:
-            case 'Total Disaster':
-                curr_disaster = 'Region_tot'
-            case 'Storm':
-                curr_disaster = 'Region_storm'
-            case 'Flood':
-                curr_disaster = 'Region_flood'
-            case 'Earthquake':
-                curr_disaster = 'Region_earth'
-            case 'Volcanic Activity':
-                curr_disaster = 'Region_vol'
-            case 'Mass Movement':
-                curr_disaster = 'Region_mass'
-            case 'Drought':
-                curr_disaster = 'Region_drought'
-            case _:
-                return
-        island_disaster = Region_gdf[Region_gdf['Island Group'] == island_group].drop(columns=['geometry', 'Area Name']).groupby(['Island Group', 'Region']).sum().reset_index().sort_values(by=curr_disaster, ascending=True, ignore_index=True)
-    elif division == 'Province':
-        curr_division = 'Area Name'
-        match disaster_type:
-            case 'Total Disaster':
-                curr_disaster = 'Total Disaster Count'
-            case 'Storm':
-                curr_disaster = 'Storm Count'
-            case 'Flood':
-                curr_disaster = 'Flood Count'
-            case 'Earthquake':
-                curr_disaster = 'Earthquake Count'
-            case 'Volcanic Activity':
-                curr_disaster = 'Volcanic Activity Count'
-            case 'Mass Movement':
-                curr_disaster = 'Mass Movement Count'
-            case 'Drought':
-                curr_disaster = 'Drought Count'
-            case _:
-                return
-        island_disaster = Region_gdf[(Region_gdf['Island Group'] == island_group)].drop(columns=['geometry']).sort_values(by=curr_disaster, ascending=True, ignore_index=True)
-    else:
+    metric = resolve(f'disaster/{division}', disaster_type)
+    if metric is None:
         return
+    curr_division = metric['division_column']
+    curr_disaster = metric['column']
+
+    island_disaster = Region_table.frame(rows=Region_table.isin('Island Group', [island_group]))
+    if division == 'Region':
+        island_disaster = island_disaster.drop(columns=['Area Name']).groupby(['Island Group', 'Region']).sum().reset_index()
+    island_disaster = island_disaster.sort_values(by=curr_disaster, ascending=True, ignore_index=True)
     # Create stacked bar plot using Plotly Express
 
     x = curr_disaster
@@ -321,4 +321,58 @@ def update_disaster_bar(division, disaster_type, island_group):
     bar_fig.update_traces(hovertemplate=hover_template,
                     customdata=island_disaster[[curr_division]])
     
-    return bar_fig
\ No newline at end of file
+    return bar_fig
+
+# Correlation Figure
+@callback(
+    Output('disaster-corr', 'figure'),
+    [Input('division-radio', 'value'), Input('corr-metric-radio', 'value')]
+)
+@cache.memoize()
+def update_corr(division, metric):
+    if correlation_df is None:
+        corr_fig = px.imshow([[np.nan]], height=600, title=f'Disasters vs {TEMPERATURE_METRICS[metric]}<br>per {division}')
+        corr_fig.add_annotation(text="Correlations have not been computed yet.<br>Run python -m analysis.correlation and restart the app.",
+                                showarrow=False, font=dict(size=14))
+        corr_fig.update_xaxes(visible=False)
+        corr_fig.update_yaxes(visible=False)
+        return corr_fig
+    disaster_types = metric_ids('disaster/Province')
+    corr = correlation_df[(correlation_df['division'] == division) & (correlation_df['temperature_metric'] == metric)]
+    cells = corr.pivot(index='disaster_type', columns='island_group').reindex(index=disaster_types)
+    island_groups = [group for group in ['All', *ISLAND_GROUPS] if group in cells['r'].columns]
+
+    corr_fig = px.imshow(cells['r'][island_groups],
+                         zmin=-1, zmax=1,
+                         color_continuous_scale='RdBu_r',
+                         text_auto='.2f',
+                         aspect='auto',
+                         height=600,
+                         title=f'Disasters vs {TEMPERATURE_METRICS[metric]}<br>per {division}')
+    corr_fig.update_layout(
+        xaxis_title='Island Group',
+        yaxis_title='Disaster Type',
+        margin=dict(l=20, r=20, t=75, b=50),
+    )
+    hover_template = '<b>%{y}</b> in %{x}<br>Correlation: %{z:.2f}<br>95% CI: %{customdata[0]:.2f} to %{customdata[1]:.2f}<br>' + \
+                     division + 's: %{customdata[2]:.0f}<extra></extra>'
+    corr_fig.update_traces(hovertemplate=hover_template,
+                           customdata=np.dstack([cells[col][island_groups].to_numpy(dtype=float) for col in ['ci_low', 'ci_high', 'n']]))
+    return corr_fig
+
+# Prefetch
+def prefetch():
+    map_figure('Region', 'Total Disaster')
+    line_figure('Region')
+    update_disaster_bar('Region', 'Total Disaster', 'Luzon')
+    update_corr('Region', 'warming_rate')
+
+def warm_inputs():
+    for division in ['Region', 'Province']:
+        yield line_figure, (division,)
+        for disaster_type in metric_ids(f'disaster/{division}'):
+            yield map_figure, (division, disaster_type)
+            for island_group in ISLAND_GROUPS:
+                yield update_disaster_bar, (division, disaster_type, island_group)
+        for metric in TEMPERATURE_METRICS:
+            yield update_corr, (division, metric)
\ No newline at end of file
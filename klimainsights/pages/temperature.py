@@ -1,100 +1,108 @@
 # Setup Folders, Tokens, and Dependencies
-from dash import html, dcc, callback, Output, Input, State, register_page
+from dash import html, dcc, callback, ctx, no_update, Output, Input, State, register_page
 import dash_bootstrap_components as dbc
 import plotly.express as px
-import pandas as pd
 import geopandas as gpd
-from pathlib import Path
 from environment.settings import MAPBOX_TOKEN
+from utils.datasets import read_dataset, melt_temperature
+from utils.shared_store import open_table
+from utils.adaptive_map import adaptive_choropleth, fits_budget, moved, focus_province
+from analysis.warming import warming_trends
+from utils.cache import cache, viewport_dependent
+from utils.metrics import resolve, metric_ids, group_metrics, set_ranges, ISLAND_GROUPS
 import dash_daq as daq
+from itertools import product
 
-datasets_folder = Path('./data')
 px.set_mapbox_access_token(MAPBOX_TOKEN)
 
 # Import Data
-temperature_gdf = gpd.read_file(datasets_folder / "temperature.geojson")
-def remove_value(string):
-    return string[:-6] if string.endswith('_value') else string
-
-melt_value = temperature_gdf.drop(columns=[col for col in temperature_gdf.columns if 'TempDiff' in col])
-melt_value.columns = [col.split('_')[0] if '_value' in col else col for col in melt_value.columns]
-melt_value = melt_value.melt(id_vars=['name', 'geometry', 'admin_div', 'island_group', 'Region'], 
-                            var_name='decade', 
-                            value_name='value')
-melt_tempdiff = temperature_gdf.drop(columns=[col for col in temperature_gdf.columns if 'value' in col])
-melt_tempdiff.columns = [col.split('_')[0] if '_TempDiff' in col else col for col in melt_tempdiff.columns]
-melt_tempdiff = melt_tempdiff.melt(id_vars=['name', 'geometry', 'admin_div', 'island_group', 'Region'], 
-                            var_name='decade', 
-                            value_name='TempDiff')
-temp_melted_gdf = pd.merge(melt_value, melt_tempdiff, on=['name', 'geometry', 'admin_div', 'island_group', 'Region', 'decade'])
+temperature_gdf = read_dataset('temperature')
+temp_melted_table = open_table('temp_melted', temperature_gdf.drop(columns=['geometry']), lambda: melt_temperature(temperature_gdf))
+warming_gdf = gpd.GeoDataFrame(warming_trends(temperature_gdf), geometry=temperature_gdf.geometry)
+set_ranges('temperature', warming_gdf)
 
 # Initialize Page
 register_page(__name__, path='/temperature', name='Temperature', title='Klima Insights | Temperature')
 
-layout = dbc.Container(className="d-flex justify-content-center align-items-center full-height full-width my-3 z-3", fluid=True, children=[
-  dbc.Row(children=[
-    dbc.Col(className="bg-light rounded z-3", width=12, md=4, children=[
-      html.Div(className="full-width-container text-dark", children=[
-          html.H3(className="mt-2", children=[
-              "Charting the Climate Shift: Examining Temperature Trends in the Philippines Across Decades"
-          ]),
-          html.P(children=[
-              "Delving into the historical records reveals a subtle yet discernible shift in the climate dynamics of the Philippines. From the relatively mild conditions of the 1960s to the present-day realities of the 2020s, there's a noticeable uptick in temperature. While the increase may not be drastic, it remains a cause for concern and warrants careful observation. What was once a region known for its moderate temperatures has gradually warmed, signaling a shift that demands attention. Understanding these incremental changes is essential in navigating the evolving climate landscape and implementing effective measures to mitigate their impact."
-          ]),
-          html.Div(className="container-fluid d-flex justify-content-center my-3",children=[
-                dbc.Button("Compare Provinces", color="primary", id="open-temp-modal", n_clicks=0)
-          ]),
-          dbc.Modal(
-            [
-                dbc.ModalHeader(dbc.ModalTitle(className="text-secondary", children=["Average Temperature per Province"])),
-                dbc.ModalBody(children=[
-                    dbc.Row(children=[
-                        dbc.Col(width=12, md=4, children=[
-                          html.Div(children=[
-                            html.H4(className="mt-2 text-light", children=[
-                                " Unraveling Temperature Trends Across Philippine Provinces from the 1960s to the 2020s"
-                            ]),
-                            html.P(className="text-light", children=[
-                                "This section delves into the temperature data per province across the Philippines spanning from the 1960s to the 2020s. Upon closer inspection, a discernible pattern emerges, indicating a modest uptick in temperatures as the decades progress. While the increase may seem subtle, it's a notable phenomenon worthy of attention. The comparative visualization reveals a trend reflective of broader climate shifts, hinting at the ongoing environmental changes affecting the nation's provinces. These findings underscore the importance of monitoring and understanding regional temperature variations, as they hold implications for both local communities and broader climate resilience efforts."
-                            ]),
-                            daq.BooleanSwitch(
-                                id='temp-bar-switch',
-                                on=False,
-                                color="#b58900",
-                                label="Show Avg Temp Increase Relative to 1960s"
-                            )
+# Built per visit so the default map comes from the (prefetched) figure cache. ?province= (from the
+# location search in the navbar) centres the map on that province and opens its island group's bars.
+def layout(province=None, **kwargs):
+  selected = temperature_gdf[temperature_gdf['name'] == province]
+  map_fig = map_figure('1960s_value')
+  island_value = 'Luzon'
+  if len(selected):
+    map_fig = focus_province(map_fig, selected.geometry.iloc[0])
+    island_value = selected['island_group'].iloc[0]
+  return dbc.Container(className="d-flex justify-content-center align-items-center full-height full-width my-3 z-3", fluid=True, children=[
+    dbc.Row(children=[
+      dbc.Col(className="bg-light rounded z-3", width=12, md=4, children=[
+        html.Div(className="full-width-container text-dark", children=[
+            html.H3(className="mt-2", children=[
+                "Charting the Climate Shift: Examining Temperature Trends in the Philippines Across Decades"
+            ]),
+            html.P(children=[
+                "Delving into the historical records reveals a subtle yet discernible shift in the climate dynamics of the Philippines. From the relatively mild conditions of the 1960s to the present-day realities of the 2020s, there's a noticeable uptick in temperature. While the increase may not be drastic, it remains a cause for concern and warrants careful observation. What was once a region known for its moderate temperatures has gradually warmed, signaling a shift that demands attention. Understanding these incremental changes is essential in navigating the evolving climate landscape and implementing effective measures to mitigate their impact."
+            ]),
+            html.Div(className="container-fluid d-flex justify-content-center my-3",children=[
+                  dbc.Button("Compare Provinces", color="primary", id="open-temp-modal", n_clicks=0)
+            ]),
+            dbc.Modal(
+              [
+                  dbc.ModalHeader(dbc.ModalTitle(className="text-secondary", children=["Average Temperature per Province"])),
+                  dbc.ModalBody(children=[
+                      dbc.Row(children=[
+                          dbc.Col(width=12, md=4, children=[
+                            html.Div(children=[
+                              html.H4(className="mt-2 text-light", children=[
+                                  " Unraveling Temperature Trends Across Philippine Provinces from the 1960s to the 2020s"
+                              ]),
+                              html.P(className="text-light", children=[
+                                  "This section delves into the temperature data per province across the Philippines spanning from the 1960s to the 2020s. Upon closer inspection, a discernible pattern emerges, indicating a modest uptick in temperatures as the decades progress. While the increase may seem subtle, it's a notable phenomenon worthy of attention. The comparative visualization reveals a trend reflective of broader climate shifts, hinting at the ongoing environmental changes affecting the nation's provinces. These findings underscore the importance of monitoring and understanding regional temperature variations, as they hold implications for both local communities and broader climate resilience efforts."
+                              ]),
+                              daq.BooleanSwitch(
+                                  id='temp-bar-switch',
+                                  on=False,
+                                  color="#b58900",
+                                  label="Show Avg Temp Increase Relative to 1960s"
+                              ),
+                              daq.BooleanSwitch(
+                                  className="mt-3",
+                                  id='temp-rate-switch',
+                                  on=False,
+                                  color="#b58900",
+                                  label="Show Warming Rate per Decade"
+                              ),
+                              html.Div(className='d-flex flex-row justify-content-center align-items-center mt-2 flex-gap-20 text-light', children=[
+                                  html.H6(className='mt-1', children=["Sort By: "]),
+                                  dcc.RadioItems(id='temp-rate-sort', options=[{'label': 'Rank', 'value': 'rank'}, {'label': 'Name', 'value': 'name'}],
+                                                 value='rank', inline=True, labelStyle={"margin-right": "20px"})
+                              ])
+                            ])
+                          ]),
+                          dbc.Col(className="temp-bar-container", width=12, md=8, children=[
+                            dcc.Dropdown(options=ISLAND_GROUPS, value=island_value, id='temp-bar-dropdown',
+                                         multi=False, searchable=False, clearable=False),
+                            dcc.Loading(type="circle", children=[dcc.Graph(id="temp-bar")])
                           ])
-                        ]),
-                        dbc.Col(className="temp-bar-container", width=12, md=8, children=[
-                          dcc.Dropdown(options=['Luzon', 'Visayas', 'Mindanao'], value='Luzon', id='temp-bar-dropdown',
-                                       multi=False, searchable=False, clearable=False),
-                          dcc.Loading(type="circle", children=[dcc.Graph(id="temp-bar")])
-                        ])
-                    ])
-                ]),
-            ],
-            id="temp-modal",
-            size="xl",
-            is_open=False,
-        ),
-        ])
-    ]),
-    dbc.Col(className="rounded", width=12, md=8, children=[
-      html.Div(className="text-dark", children=[
-          dcc.Dropdown(options=[{'label': '1960s', 'value': '1960s_value'},
-                                {'label': '1970s', 'value': '1970s_value'},
-                                {'label': '1980s', 'value': '1980s_value'},
-                                {'label': '1990s', 'value': '1990s_value'},
-                                {'label': '2000s', 'value': '2000s_value'},
-                                {'label': '2010s', 'value': '2010s_value'},
-                                {'label': '2020s', 'value': '2020s_value'}], 
-                                value='1960s_value', id='temp-map-dropdown',
-                                multi=False, searchable=False, clearable=False),
-          dcc.Loading(type="circle", children=[dcc.Graph(id="temp-map", responsive=True)])
-        ])
+                      ])
+                  ]),
+              ],
+              id="temp-modal",
+              size="xl",
+              is_open=False,
+          ),
+          ])
+      ]),
+      dbc.Col(className="rounded", width=12, md=8, children=[
+        html.Div(className="text-dark", children=[
+            dcc.Dropdown(options=[{'label': metric['label'], 'value': metric['id']} for metric in group_metrics('temperature')],
+                                  value='1960s_value', id='temp-map-dropdown',
+                                  multi=False, searchable=False, clearable=False),
+            dcc.Loading(type="circle", children=[dcc.Graph(id="temp-map", figure=map_fig, responsive=True)])
+          ])
+      ])
     ])
   ])
-])
 
 # Compare Modal
 @callback(
@@ -110,11 +118,15 @@ def toggle_modal(n1, is_open):
 # Bar Figure
 @callback(
     Output('temp-bar', 'figure'),
-    [Input('temp-bar-dropdown', 'value'),Input('temp-bar-switch', 'on')]
+    [Input('temp-bar-dropdown', 'value'),Input('temp-bar-switch', 'on'), Input('temp-rate-switch', 'on'), Input('temp-rate-sort', 'value')]
 )
-def update_bar_fig(island_value, switch):
+@cache.memoize()
+def update_bar_fig(island_value, switch, rate_switch=False, rate_sort='rank'):
+    if rate_switch:
+        return warming_bar_fig(island_value, rate_sort)
+
     if switch:
-        island_gdf = temp_melted_gdf[(temp_melted_gdf['island_group'].isin([island_value])) & (temp_melted_gdf['decade'].isin(['1960s']) == False)].drop(columns=['geometry'])
+        island_gdf = temp_melted_table.frame(rows=temp_melted_table.isin('island_group', [island_value]) & ~temp_melted_table.isin('decade', ['1960s']))
         # Create the Figure with horizontal orientation
         bar1960_fig = px.bar(island_gdf, y='name', x='TempDiff', animation_frame="decade", orientation='h')
         bar1960_fig.update_layout(
@@ -179,7 +191,7 @@ def update_bar_fig(island_value, switch):
         return bar1960_fig
     
     else:
-        island_gdf = temp_melted_gdf[(temp_melted_gdf['island_group'].isin([island_value]) == True)].drop(columns=['geometry'])
+        island_gdf = temp_melted_table.frame(rows=temp_melted_table.isin('island_group', [island_value]))
         # Create the Figure with horizontal orientation
         bar_fig = px.bar(island_gdf, y='name', x='value', animation_frame="decade", orientation='h')
         bar_fig.update_layout(
@@ -273,32 +285,110 @@ def update_bar_fig(island_value, switch):
 
         return bar_fig
 
+def warming_bar_fig(island_value, rate_sort):
+    island_rates = warming_gdf[warming_gdf['island_group'] == island_value].drop(columns=['geometry'])
+    # Horizontal bars are drawn bottom-up, so sort in reverse to put the top rank or first name at the top
+    island_rates = island_rates.sort_values(by=rate_sort, ascending=False, ignore_index=True)
+    rate_fig = px.bar(island_rates, y='name', x='slope', orientation='h',
+                      error_x=island_rates['ci_high'] - island_rates['slope'],
+                      error_x_minus=island_rates['slope'] - island_rates['ci_low'],
+                      color='slope', color_continuous_scale='reds')
+    rate_fig.update_layout(
+        height=750,
+        title=f'Warming Rate per Decade (1960s to 2020s)<br>Across {island_value} Provinces',
+        margin=dict(l=20, r=20, t=75, b=50),
+        yaxis=dict(
+            title="Province Name",
+            tickfont=dict(size=11)
+        ),
+        xaxis=dict(
+            title="Warming Rate (°C/decade)",
+            tickfont=dict(size=13),
+            tickangle=0
+        ),
+        coloraxis_showscale=False,
+        font=dict(
+            size=12
+        )
+    )
+    hover_template = "<b>%{y}</b><br>" + \
+                    "Warming Rate: %{x:.3f}°C/decade<br>" + \
+                    "95% CI: %{customdata[0]:.3f} to %{customdata[1]:.3f}<br>" + \
+                    "Rank: %{customdata[2]} of " + str(warming_gdf['rank'].notna().sum()) + "<extra></extra>"
+    rate_fig.update_traces(hovertemplate=hover_template,
+                           customdata=island_rates[['ci_low', 'ci_high', 'rank']])
+    return rate_fig
+
+def warming_map_fig(metric, relayout_data):
+    hover_template = '<b>%{customdata[0]}</b><br>Warming Rate: %{customdata[1]:.3f}°C/decade<br>' + \
+                     '95% CI: %{customdata[2]:.3f} to %{customdata[3]:.3f}<br>Rank: %{customdata[4]}<extra></extra>'
+    # Averaged ranks and intervals are not ranks or intervals, so dissolved regions show only the mean rate
+    region_hover_template = '<b>%{customdata[0]}</b><br>Mean Warming Rate: %{customdata[1]:.3f}°C/decade<extra></extra>'
+    map_fig = adaptive_choropleth(warming_gdf,
+                                    color=metric['column'],
+                                    customdata=['name', metric['column'], 'ci_low', 'ci_high', 'rank'],
+                                    relayout_data=relayout_data,
+                                    parent='Region',
+                                    aggfunc='mean',
+                                    hovertemplate=hover_template,
+                                    aggregate_hover=(['name', metric['column']], region_hover_template),
+                                    color_continuous_scale=metric['colorscale'],
+                                    range_color=metric['range'],
+                                    zoom=5,
+                                    center={"lat": 12.8797, "lon": 122.7740},
+                                    opacity=0.6,
+                                    )
+    map_fig.update_layout(
+        coloraxis_colorbar=dict(title="Warming Rate<br>(°C/decade)", yanchor="top", xanchor='left',
+                                y=1, x=0, ticks="outside", ticklabelposition="outside left", thickness=10, title_font_color='#0c232c',
+                                tickfont=dict(
+                                    size=12,
+                                    color='#0c232c')
+                                ),
+        margin=dict(l=0, r=0, t=0, b=0),
+    )
+    return map_fig
+
 # Map Figure
 @callback(
     Output('temp-map', 'figure'),
-    Input('temp-map-dropdown', 'value')
+    [Input('temp-map-dropdown', 'value'), Input('temp-map', 'relayoutData')],
+    prevent_initial_call=True
 )
-def update_map_fig(decade_value):
-    tempscale = [
-        [0, 'blue'],
-        [0.75, 'red'],
-        [1, 'rgb(255, 96, 96)']
-    ]
+def update_map_fig(decade_value, relayout_data=None):
+    if fits_budget(temperature_gdf):
+        # Panning or zooming only needs a new figure when the layer is too large to draw in full
+        if relayout_data is not None and ctx.triggered_id == 'temp-map':
+            return no_update
+        relayout_data = None
+    elif not moved(relayout_data):
+        # The default viewport, so the cached full-extent figure
+        relayout_data = None
+    return map_figure(decade_value, relayout_data)
+
+@cache.memoize(unless=viewport_dependent)
+def map_figure(decade_value, relayout_data=None):
+    metric = resolve('temperature', decade_value)
+    if metric is None:
+        return
+    if decade_value == 'warming_rate':
+        return warming_map_fig(metric, relayout_data)
 
-    map_fig = px.choropleth_mapbox(temperature_gdf,
-                                    geojson=temperature_gdf.geometry,
-                                    locations=temperature_gdf.index,
-                                    color=decade_value,
-                                    color_continuous_scale=tempscale,
-                                    range_color=[25, 33],
+    map_fig = adaptive_choropleth(temperature_gdf,
+                                    color=metric['column'],
+                                    customdata=['name', metric['column']],
+                                    relayout_data=relayout_data,
+                                    parent='Region',
+                                    aggfunc='mean',
+                                    color_continuous_scale=metric['colorscale'],
+                                    range_color=metric['range'],
                                     # color_continuous_midpoint=28,
-                                    mapbox_style='streets',
                                     zoom=5,
                                     center={"lat": 12.8797, "lon": 122.7740},
                                     opacity=0.6,
                                     )
     map_fig.update_layout(
-        coloraxis_colorbar=dict(title=f"{remove_value(decade_value)}<br>Average<br>Temperature(°C)", yanchor="top", xanchor='left',
+        coloraxis_colorbar=dict(title=f"{metric['label']}<br>Average<br>Temperature(°C)", yanchor="top", xanchor='left',
                                 y=1, x=0, ticks="outside", ticklabelposition="outside left", thickness=10, title_font_color='#0c232c',
                                 tickvals=[i for i in range(0, 33)],
                                 tickmode='array',
@@ -311,7 +401,17 @@ def update_map_fig(decade_value):
     map_fig.update_layout(
         margin=dict(l=0, r=0, t=0, b=0),
     )
-    hover_template = '<b>%{customdata[0]}</b><br>during the '+ remove_value(decade_value) +'<br>Average Temp: %{customdata[1]:.2f}°C<extra></extra>'
-    map_fig.update_traces(hovertemplate=hover_template,
-                           customdata=temperature_gdf[['name', decade_value]])
-    return map_fig
\ No newline at end of file
+    hover_template = '<b>%{customdata[0]}</b><br>during the '+ metric['label'] +'<br>Average Temp: %{customdata[1]:.2f}°C<extra></extra>'
+    map_fig.update_traces(hovertemplate=hover_template)
+    return map_fig
+
+# Prefetch
+def prefetch():
+    map_figure('1960s_value')
+    update_bar_fig('Luzon', False, False, 'rank')
+
+def warm_inputs():
+    for metric_id in metric_ids('temperature'):
+        yield map_figure, (metric_id,)
+    for island_value, switch, rate_switch, rate_sort in product(ISLAND_GROUPS, [False, True], [False, True], ['rank', 'name']):
+        yield update_bar_fig, (island_value, switch, rate_switch, rate_sort)
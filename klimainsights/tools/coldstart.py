@@ -0,0 +1,101 @@
+"""Measure wake-up latency: time from launching the server to its first page, readiness and first callback.
+
+Run from the klimainsights directory:
+
+    python -m tools.coldstart --runs 5 --append coldstart.jsonl
+    python -m tools.coldstart --command "docker run --rm -p {port}:7860 klima-insights:coldstart"
+
+Each run starts a fresh server process, so nothing is shared with the previous run except the OS page
+cache. Appending to a JSON-lines file tracks the numbers across releases (VERSION from the .env file).
+"""
+import argparse
+import json
+import shlex
+import socket
+import statistics
+import subprocess
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime, timezone
+
+DEFAULT_COMMAND = 'gunicorn index:server -b 127.0.0.1:{port} --workers=1'
+
+FIRST_CALLBACK = {
+    'output': 'temp-map.figure',
+    'outputs': {'id': 'temp-map', 'property': 'figure'},
+    'inputs': [{'id': 'temp-map-dropdown', 'property': 'value', 'value': '2020s_value'},
+               {'id': 'temp-map', 'property': 'relayoutData', 'value': None}],
+    'changedPropIds': ['temp-map-dropdown.value'],
+    'state': [],
+}
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def wait_for(url, start, deadline, data=None):
+    """Poll url until it answers 200 and return the seconds elapsed since start."""
+    headers = {'Content-Type': 'application/json'} if data else {}
+    while time.perf_counter() < deadline:
+        try:
+            with urllib.request.urlopen(urllib.request.Request(url, data=data, headers=headers), timeout=30) as response:
+                response.read()
+                if response.status == 200:
+                    return time.perf_counter() - start
+        except (urllib.error.URLError, ConnectionError, OSError):
+            time.sleep(0.05)
+    raise TimeoutError(f'{url} did not answer within the timeout')
+
+def measure(command, timeout):
+    port = free_port()
+    base = f'http://127.0.0.1:{port}'
+    start = time.perf_counter()
+    process = subprocess.Popen(shlex.split(command.format(port=port)), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = start + timeout
+    try:
+        first_response = wait_for(base + '/', start, deadline)
+        ready = wait_for(base + '/_ready', start, deadline)
+        callback_start = time.perf_counter()
+        wait_for(base + '/_dash-update-component', callback_start, deadline, json.dumps(FIRST_CALLBACK).encode())
+        first_callback = time.perf_counter() - callback_start
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {'first_response_s': first_response, 'ready_s': ready, 'first_callback_s': first_callback}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--command', default=DEFAULT_COMMAND, help='Server command; {port} is replaced with a free port')
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--timeout', type=float, default=300, help='Seconds to wait for each run')
+    parser.add_argument('--append', help='Append the report as one JSON line to this file')
+    args = parser.parse_args()
+
+    from environment.settings import VERSION
+
+    runs = []
+    for i in range(args.runs):
+        runs.append(measure(args.command, args.timeout))
+        print(f'run {i + 1}: ' + ', '.join(f'{key} {value:.2f}' for key, value in runs[-1].items()))
+
+    summary = {key: {'median': statistics.median(run[key] for run in runs),
+                     'min': min(run[key] for run in runs),
+                     'max': max(run[key] for run in runs)}
+               for key in runs[0]}
+    print(f'\n{"metric":<20} {"median s":>9} {"min s":>9} {"max s":>9}')
+    for key, row in summary.items():
+        print(f'{key:<20} {row["median"]:>9.2f} {row["min"]:>9.2f} {row["max"]:>9.2f}')
+
+    if args.append:
+        report = {'version': VERSION, 'timestamp': datetime.now(timezone.utc).isoformat(),
+                  'command': args.command, 'runs': runs, 'summary': summary}
+        with open(args.append, 'a') as f:
+            f.write(json.dumps(report) + '\n')
+
+if __name__ == '__main__':
+    main()
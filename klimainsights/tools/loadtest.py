@@ -0,0 +1,290 @@
+"""Replay scripted dashboard sessions against index.server and report latency per callback.
+
+Run from the klimainsights directory:
+
+    python -m tools.loadtest --users 1,5,10 --duration 30
+    python -m tools.loadtest --url http://localhost:7860 --users 4,8,16 --json report.json
+
+Without --url the app is imported and served in-process on a free local port.
+"""
+import argparse
+import http.client
+import json
+import logging
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+from utils.metrics import DECADES, ISLAND_GROUPS, metric_ids
+
+# Viewport reported by a map after zooming into Metro Manila
+ZOOMED_IN = {'mapbox.center': {'lat': 14.6, 'lon': 121.0}, 'mapbox.zoom': 9}
+DISASTER_TYPES = metric_ids('disaster/Province')
+
+# Request Builders
+def get(path):
+    return {'method': 'GET', 'path': path, 'label': 'GET ' + path}
+
+def callback(outputs, inputs, state=(), changed=None):
+    """Build a Dash callback request. outputs/inputs/state are (id, property[, value]) tuples."""
+    outputs_spec = [{'id': id_, 'property': prop} for id_, prop in outputs]
+    if len(outputs) == 1:
+        output = f'{outputs[0][0]}.{outputs[0][1]}'
+        outputs_spec = outputs_spec[0]
+    else:
+        output = '..' + '...'.join(f'{id_}.{prop}' for id_, prop in outputs) + '..'
+    body = {
+        'output': output,
+        'outputs': outputs_spec,
+        'inputs': [{'id': id_, 'property': prop, 'value': value} for id_, prop, value in inputs],
+        'changedPropIds': [f'{id_}.{prop}' for id_, prop, _ in (changed or inputs[:1])],
+        'state': [{'id': id_, 'property': prop, 'value': value} for id_, prop, value in state],
+    }
+    return {'method': 'POST', 'path': '/_dash-update-component', 'label': output, 'body': body}
+
+def navigate(path, search=''):
+    return callback([('_pages_content', 'children'), ('_pages_store', 'data')],
+                    [('_pages_location', 'pathname', path), ('_pages_location', 'search', search)])
+
+def prefetch(path):
+    return callback([('prefetch-store', 'data')], [('url', 'pathname', path)])
+
+def map_click(response, graph_id):
+    """Pick a random location from a returned choropleth and build its clickData."""
+    try:
+        customdata = response['response'][graph_id]['figure']['data'][0]['customdata']
+    except (KeyError, IndexError, TypeError):
+        return None
+    return {'points': [{'customdata': random.choice(customdata)}]} if customdata else None
+
+def located_province(response):
+    """The province name in a find_location result, or None when nothing was found."""
+    try:
+        return response['response']['locate-result']['children']['props']['children'][0]['props']['children'][0]
+    except (KeyError, IndexError, TypeError):
+        return None
+
+# Scripted Sessions
+# Each session is a generator that yields requests and receives the decoded JSON response back.
+def landing_session():
+    yield get('/')
+    yield get('/_dash-layout')
+    yield get('/_dash-dependencies')
+    yield navigate('/')
+    yield prefetch('/')
+
+def temp_bar_inputs(island, switch=False, rate_switch=False, rate_sort='rank'):
+    return [('temp-bar-dropdown', 'value', island), ('temp-bar-switch', 'on', switch),
+            ('temp-rate-switch', 'on', rate_switch), ('temp-rate-sort', 'value', rate_sort)]
+
+def temperature_session():
+    yield navigate('/temperature')
+    yield prefetch('/temperature')
+    yield callback([('temp-modal', 'is_open')], [('open-temp-modal', 'n_clicks', 0)], state=[('temp-modal', 'is_open', False)])
+    yield callback([('temp-bar', 'figure')], temp_bar_inputs('Luzon'))
+    yield callback([('temp-map', 'figure')], [('temp-map-dropdown', 'value', '1960s_value'), ('temp-map', 'relayoutData', ZOOMED_IN)],
+                   changed=[('temp-map', 'relayoutData', ZOOMED_IN)])
+    for decade in random.sample(DECADES[1:], 3):
+        yield callback([('temp-map', 'figure')], [('temp-map-dropdown', 'value', decade + '_value'), ('temp-map', 'relayoutData', None)])
+    yield callback([('temp-modal', 'is_open')], [('open-temp-modal', 'n_clicks', 1)], state=[('temp-modal', 'is_open', False)])
+    island = random.choice(ISLAND_GROUPS)
+    yield callback([('temp-bar', 'figure')], temp_bar_inputs(island))
+    yield callback([('temp-bar', 'figure')], temp_bar_inputs(island, switch=True), changed=[('temp-bar-switch', 'on', True)])
+    yield callback([('temp-bar', 'figure')], temp_bar_inputs(island, rate_switch=True), changed=[('temp-rate-switch', 'on', True)])
+    yield callback([('temp-map', 'figure')], [('temp-map-dropdown', 'value', 'warming_rate'), ('temp-map', 'relayoutData', None)])
+
+def disaster_session():
+    yield navigate('/disaster')
+    yield prefetch('/disaster')
+    yield callback([('disaster-modal', 'is_open')], [('open-disaster-modal', 'n_clicks', 0)], state=[('disaster-modal', 'is_open', False)])
+    division = random.choice(['Region', 'Province'])
+    # The default line and map are part of the page layout; switching division re-renders both
+    yield callback([('disaster-line', 'figure')], [('division-radio', 'value', division), ('disaster-map', 'clickData', None)])
+    response = yield callback([('disaster-map', 'figure')], [('division-radio', 'value', division), ('disaster-type-dropdown', 'value', 'Total Disaster'),
+                                                             ('disaster-map', 'relayoutData', None)])
+    for _ in range(3):
+        click_data = map_click(response, 'disaster-map')
+        if click_data is None:
+            break
+        yield callback([('disaster-line', 'figure')], [('division-radio', 'value', division), ('disaster-map', 'clickData', click_data)],
+                       changed=[('disaster-map', 'clickData', click_data)])
+    disaster_type = random.choice(DISASTER_TYPES[1:])
+    yield callback([('disaster-map', 'figure')], [('division-radio', 'value', division), ('disaster-type-dropdown', 'value', disaster_type),
+                                                  ('disaster-map', 'relayoutData', ZOOMED_IN)],
+                   changed=[('disaster-type-dropdown', 'value', disaster_type)])
+    yield callback([('disaster-bar', 'figure')], [('division-radio', 'value', division), ('disaster-type-dropdown', 'value', disaster_type),
+                                                  ('disaster-bar-dropdown', 'value', random.choice(ISLAND_GROUPS))])
+    yield callback([('disaster-corr', 'figure')], [('division-radio', 'value', division), ('corr-metric-radio', 'value', 'warming_rate')])
+
+def biodiversity_session():
+    yield navigate('/biodiversity')
+    yield prefetch('/biodiversity')
+    island = random.choice(ISLAND_GROUPS)
+    response = yield callback([('biodiversity-choropleth', 'figure')], [('region-dropdown', 'value', island), ('species-dropdown', 'value', 'total_species')])
+    yield callback([('endangered-species-bar', 'figure')], [('region-dropdown', 'value', island), ('bio-switch', 'on', False),
+                                                            ('biodiversity-choropleth', 'clickData', None)],
+                   [('bio-province', 'data', None)])
+    yield callback([('endangered-species-bar', 'figure')], [('region-dropdown', 'value', island), ('bio-switch', 'on', True),
+                                                            ('biodiversity-choropleth', 'clickData', None)],
+                   [('bio-province', 'data', None)], changed=[('bio-switch', 'on', True)])
+    click_data = map_click(response, 'biodiversity-choropleth')
+    if click_data is not None:
+        yield callback([('endangered-species-bar', 'figure')], [('region-dropdown', 'value', island), ('bio-switch', 'on', True),
+                                                                ('biodiversity-choropleth', 'clickData', click_data)],
+                       [('bio-province', 'data', None)], changed=[('biodiversity-choropleth', 'clickData', click_data)])
+
+def locate_session():
+    # A coordinate somewhere over the archipelago, looked up and then opened on each page
+    lat, lon = random.uniform(5, 19), random.uniform(117, 127)
+    response = yield callback([('locate-result', 'children'), ('locate-lat', 'value'), ('locate-lon', 'value')],
+                              [('locate-search', 'n_clicks', 1), ('locate-geo', 'data', None)],
+                              [('locate-lat', 'value', lat), ('locate-lon', 'value', lon)])
+    province = located_province(response)
+    if province is not None:
+        for path in ['/temperature', '/disaster', '/biodiversity']:
+            yield navigate(path, '?' + urlencode({'province': province}))
+
+SESSIONS = [landing_session, temperature_session, disaster_session, biodiversity_session, locate_session]
+
+# Virtual Users
+class VirtualUser(threading.Thread):
+    def __init__(self, host, port, deadline, think_time, results):
+        super().__init__(daemon=True)
+        self.host = host
+        self.port = port
+        self.deadline = deadline
+        self.think_time = think_time
+        self.results = results
+        self.connection = None
+
+    def send(self, request):
+        if self.connection is None:
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+        body = json.dumps(request['body']) if 'body' in request else None
+        headers = {'Content-Type': 'application/json'} if body else {}
+        start = time.perf_counter()
+        try:
+            self.connection.request(request['method'], request['path'], body=body, headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            payload, ok = b'', False
+        self.results.append((request['label'], time.perf_counter() - start, ok))
+        if ok and payload and request['method'] == 'POST':
+            return json.loads(payload)
+        return None
+
+    def run(self):
+        while time.perf_counter() < self.deadline:
+            for session in SESSIONS:
+                steps = session()
+                try:
+                    request = next(steps)
+                    while time.perf_counter() < self.deadline:
+                        response = self.send(request)
+                        if self.think_time:
+                            time.sleep(random.uniform(0, self.think_time))
+                        request = steps.send(response)
+                except StopIteration:
+                    pass
+        if self.connection is not None:
+            self.connection.close()
+
+# Reporting
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return float('nan')
+    # Nearest-rank: the smallest value with at least q% of the samples at or below it
+    index = max(0, math.ceil(q / 100 * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+def summarize(results, elapsed):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    for label, latency, ok in results:
+        latencies[label].append(latency)
+        if not ok:
+            errors[label] += 1
+    summary = {}
+    for label, values in sorted(latencies.items()):
+        values.sort()
+        summary[label] = {
+            'count': len(values),
+            'errors': errors[label],
+            'p50_ms': percentile(values, 50) * 1000,
+            'p95_ms': percentile(values, 95) * 1000,
+            'p99_ms': percentile(values, 99) * 1000,
+            'throughput_rps': len(values) / elapsed,
+        }
+    return summary
+
+def print_summary(users, summary, elapsed):
+    total = sum(row['count'] for row in summary.values())
+    print(f'\n{users} virtual user(s), {elapsed:.1f}s, {total} requests, {total / elapsed:.1f} req/s')
+    print(f'{"callback":<60} {"count":>7} {"err":>5} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9} {"req/s":>8}')
+    for label, row in summary.items():
+        print(f'{label[:60]:<60} {row["count"]:>7} {row["errors"]:>5} {row["p50_ms"]:>9.1f} '
+              f'{row["p95_ms"]:>9.1f} {row["p99_ms"]:>9.1f} {row["throughput_rps"]:>8.2f}')
+
+def run_stage(host, port, users, duration, ramp, think_time):
+    results = []
+    start = time.perf_counter()
+    deadline = start + ramp + duration
+    threads = []
+    for i in range(users):
+        thread = VirtualUser(host, port, deadline, think_time, results)
+        thread.start()
+        threads.append(thread)
+        if ramp and i < users - 1:
+            time.sleep(ramp / users)
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return summarize(results, elapsed), elapsed
+
+def serve_locally():
+    from werkzeug.serving import make_server
+    from index import server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    httpd = make_server('127.0.0.1', 0, server, threaded=True)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return '127.0.0.1', httpd.server_port
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--url', help='Base URL of a running server (default: serve index.server in-process)')
+    parser.add_argument('--users', default='1,5,10', help='Comma-separated concurrency levels to ramp through')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to hold each concurrency level')
+    parser.add_argument('--ramp', type=float, default=5, help='Seconds over which users are started at each level')
+    parser.add_argument('--think-time', type=float, default=0, help='Maximum random pause between requests, in seconds')
+    parser.add_argument('--seed', type=int, help='Random seed for reproducible sessions')
+    parser.add_argument('--json', help='Write the per-level summary to this file')
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    if args.url:
+        parts = urlsplit(args.url)
+        host, port = parts.hostname, parts.port or 80
+    else:
+        host, port = serve_locally()
+
+    report = {}
+    for users in [int(level) for level in args.users.split(',')]:
+        summary, elapsed = run_stage(host, port, users, args.duration, args.ramp, args.think_time)
+        print_summary(users, summary, elapsed)
+        report[users] = {'elapsed_s': elapsed, 'callbacks': summary}
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
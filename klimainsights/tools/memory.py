@@ -0,0 +1,223 @@
+"""Memory accounting for the module-level datasets held by each page, and tracemalloc diffs around callbacks.
+
+Run from the klimainsights directory:
+
+    python -m tools.memory
+    python -m tools.memory --callback pages.temperature.update_map_fig 1960s_value
+
+The same reports are served at /_debug/memory and /_debug/memory/callback when MEMORY_DEBUG_ROUTES is set.
+"""
+import argparse
+import gc
+import importlib
+import json
+import sys
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+import shapely
+from geopandas.array import GeometryDtype
+from plotly.basedatatypes import BaseFigure
+
+from utils.shared_store import SharedTable
+
+MB = 1024 * 1024
+
+# tracemalloc is process-wide, so only one callback diff may trace at a time
+_tracing = threading.Lock()
+
+# Dataset Accounting
+def frame_memory(frame):
+    """Deep memory of a (Geo)DataFrame split into geometry, object and numeric columns."""
+    usage = frame.memory_usage(deep=True, index=True)
+    report = {'rows': len(frame), 'index_bytes': int(usage['Index']), 'geometry_bytes': 0, 'object_bytes': 0, 'numeric_bytes': 0}
+    for col in frame.columns:
+        if isinstance(frame[col].dtype, GeometryDtype):
+            # pandas only sees the Python wrappers; add the coordinates held by GEOS
+            coords = shapely.get_num_coordinates(np.asarray(frame[col])).sum()
+            report['geometry_bytes'] += int(usage[col] + coords * 16)
+        elif frame[col].dtype == object or isinstance(frame[col].dtype, pd.StringDtype):
+            report['object_bytes'] += int(usage[col])
+        else:
+            report['numeric_bytes'] += int(usage[col])
+    report['total_bytes'] = report['index_bytes'] + report['geometry_bytes'] + report['object_bytes'] + report['numeric_bytes']
+    return report
+
+def object_memory(obj):
+    if isinstance(obj, pd.DataFrame):
+        return frame_memory(obj)
+    if isinstance(obj, pd.Series):
+        return frame_memory(obj.to_frame())
+    if isinstance(obj, np.ndarray):
+        return {'rows': len(obj), 'total_bytes': int(obj.nbytes)}
+    if isinstance(obj, SharedTable):
+        # Memory-mapped and shared between workers, so it counts once per host rather than per process
+        return {'rows': len(obj), 'total_bytes': obj.nbytes, 'shared': True}
+    if isinstance(obj, BaseFigure):
+        # Serialized size is what the figure costs per response and a fair proxy for its footprint
+        return {'traces': len(obj.data), 'total_bytes': len(obj.to_json())}
+    return None
+
+def page_modules():
+    from dash import page_registry
+
+    return {page['module']: sys.modules[page['module']] for page in page_registry.values() if page['module'] in sys.modules}
+
+def dataset_memory():
+    """Deep memory usage of every module-level dataset and figure in pages/."""
+    report = {}
+    seen = {}
+    for module_name, module in page_modules().items():
+        for name, obj in vars(module).items():
+            usage = object_memory(obj)
+            if usage is None:
+                continue
+            usage['type'] = type(obj).__name__
+            if id(obj) in seen:
+                usage['same_object_as'] = seen[id(obj)]
+            else:
+                seen[id(obj)] = f'{module_name}.{name}'
+            report[f'{module_name}.{name}'] = usage
+    return report
+
+# Callback Snapshots
+def registered_callbacks():
+    """The functions behind every server-side Dash callback, before and after the app moves them to its own map."""
+    from dash._callback import GLOBAL_CALLBACK_MAP
+
+    from app import app
+
+    entries = [*GLOBAL_CALLBACK_MAP.values(), *app.callback_map.values()]
+    return {entry['callback'].__wrapped__ for entry in entries if 'callback' in entry}
+
+def resolve_callback(path):
+    """A page callback or memoized figure helper by dotted path; anything else in a page module is refused."""
+    module_name, _, func_name = path.rpartition('.')
+    if module_name not in page_modules():
+        raise KeyError(f'{module_name} is not a page module')
+    func = getattr(importlib.import_module(module_name), func_name)
+    if func not in registered_callbacks() and not hasattr(func, 'uncached'):
+        raise KeyError(f'{path} is not a callback')
+    # Dash wraps callbacks; call the original function so no request context is needed
+    func = getattr(func, '__wrapped__', func)
+    return getattr(func, 'uncached', func)
+
+@contextmanager
+def figure_cache_bypassed():
+    """Swap the figure cache for a NullCache, so memoized helpers called by a callback build their figures again."""
+    from flask_caching.backends import NullCache
+
+    from app import app
+    from utils.cache import cache
+
+    backends = app.server.extensions['cache']
+    backend = backends[cache]
+    backends[cache] = NullCache()
+    try:
+        yield
+    finally:
+        backends[cache] = backend
+
+def top_stats(after, before, limit):
+    stats = after.compare_to(before, 'lineno')
+    return [{'location': f'{stat.traceback[0].filename}:{stat.traceback[0].lineno}',
+             'size_diff_bytes': stat.size_diff,
+             'count_diff': stat.count_diff}
+            for stat in stats[:limit] if stat.size_diff]
+
+def callback_memory_diff(path, args, limit=20, warmup=True):
+    """Diff tracemalloc snapshots taken before, during (result alive) and after a callback invocation."""
+    from utils.prefetch import start_warmup
+
+    func = resolve_callback(path)
+    # Let the startup warm-up thread finish so its allocations stay out of the snapshots
+    start_warmup().wait()
+    with _tracing, figure_cache_bypassed():
+        if warmup:
+            # Keep plotly's lazy imports and validator caches out of the diff
+            func(*args)
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        filters = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, '<frozen importlib._bootstrap*>')]
+        try:
+            gc.collect()
+            before = tracemalloc.take_snapshot().filter_traces(filters)
+            tracemalloc.reset_peak()
+            base_current, _ = tracemalloc.get_traced_memory()
+            result = func(*args)
+            current, peak = tracemalloc.get_traced_memory()
+            held = tracemalloc.take_snapshot().filter_traces(filters)
+            del result
+            gc.collect()
+            retained_current, _ = tracemalloc.get_traced_memory()
+            retained = tracemalloc.take_snapshot().filter_traces(filters)
+        finally:
+            if started:
+                tracemalloc.stop()
+        return {
+            'callback': path,
+            'args': list(args),
+            'peak_bytes': peak - base_current,
+            'result_bytes': current - base_current,
+            'retained_bytes': retained_current - base_current,
+            'top_allocations': top_stats(held, before, limit),
+            'top_retained': top_stats(retained, before, limit),
+        }
+
+# Debug Routes
+def register_memory_routes(server):
+    from flask import jsonify, request
+
+    @server.route('/_debug/memory')
+    def debug_memory():
+        return jsonify(dataset_memory())
+
+    @server.route('/_debug/memory/callback')
+    def debug_memory_callback():
+        try:
+            args = json.loads(request.args.get('args', '[]'))
+            return jsonify(callback_memory_diff(request.args['name'], args, int(request.args.get('limit', 20)),
+                                                request.args.get('warmup', '1') != '0'))
+        except (KeyError, AttributeError, ValueError, TypeError) as e:
+            return jsonify({'error': repr(e)}), 400
+
+# CLI
+def parse_arg(value):
+    try:
+        return json.loads(value)
+    except ValueError:
+        return value
+
+def print_datasets(report):
+    print(f'{"dataset":<50} {"type":<16} {"rows":>7} {"geometry MB":>12} {"object MB":>10} {"numeric MB":>11} {"total MB":>9}')
+    for name, row in sorted(report.items(), key=lambda item: -item[1]['total_bytes']):
+        note = f'  (same as {row["same_object_as"]})' if 'same_object_as' in row else '  (memory-mapped)' if row.get('shared') else ''
+        print(f'{name:<50} {row["type"]:<16} {row.get("rows", row.get("traces", 0)):>7} '
+              f'{row.get("geometry_bytes", 0) / MB:>12.2f} {row.get("object_bytes", 0) / MB:>10.2f} '
+              f'{row.get("numeric_bytes", 0) / MB:>11.2f} {row["total_bytes"] / MB:>9.2f}{note}')
+    unique = sum(row['total_bytes'] for row in report.values() if 'same_object_as' not in row)
+    mapped = sum(row['total_bytes'] for row in report.values() if row.get('shared') and 'same_object_as' not in row)
+    print(f'\nTotal (unique objects): {unique / MB:.2f} MB, of which {mapped / MB:.2f} MB memory-mapped')
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--callback', help='Dotted path of a page callback, e.g. pages.temperature.update_map_fig')
+    parser.add_argument('args', nargs='*', help='Callback arguments, parsed as JSON when possible')
+    parser.add_argument('--limit', type=int, default=20, help='Number of allocation sites to show')
+    parser.add_argument('--no-warmup', action='store_true', help='Include first-call imports and caches in the diff')
+    args = parser.parse_args()
+
+    import index  # noqa: F401 -- registers and imports every page
+
+    if args.callback:
+        print(json.dumps(callback_memory_diff(args.callback, [parse_arg(value) for value in args.args], args.limit,
+                                              not args.no_warmup), indent=2))
+    else:
+        print_datasets(dataset_memory())
+
+if __name__ == '__main__':
+    main()
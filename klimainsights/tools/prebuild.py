@@ -0,0 +1,46 @@
+"""Build the data, analysis and figure artifacts a cold-start image ships with.
+
+Run from the klimainsights directory (the Dockerfile's coldstart target does this at build time):
+
+    CACHE_TYPE=FileSystemCache CACHE_DIR=/tmp/figures CACHE_DEFAULT_TIMEOUT=0 python -m tools.prebuild
+
+GeoJSON files are converted to GeoParquet first, so importing the app below already takes the fast
+path, and the correlation cube is built before the pages read it. Importing the pages builds the
+dataset stores, and warming every page writes the figure of every input combination the metric
+registry allows to the configured cache, which must be persistent (FileSystemCache) for them to be
+kept.
+"""
+import time
+
+from analysis.correlation import build_correlation_cube, load_correlation_cube
+from utils.datasets import prebuild_dataset, read_dataset
+
+DATASETS = ['temperature', 'disaster', 'biodiversity']
+
+def main():
+    start = time.perf_counter()
+    for name in DATASETS:
+        print(f'Wrote {prebuild_dataset(name)}')
+    print(f'Datasets: {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    disaster_gdf, temperature_gdf = read_dataset('disaster'), read_dataset('temperature')
+    if load_correlation_cube(disaster_gdf, temperature_gdf) is None:
+        print(f'Wrote {build_correlation_cube(disaster_gdf, temperature_gdf)}')
+    print(f'Correlation cube: {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    import index  # noqa: F401 -- loads every page, building missing dataset stores
+    from environment.settings import CACHE_TYPE
+    from utils.prefetch import start_warmup, warm_every_input
+    print(f'App import: {time.perf_counter() - start:.2f}s')
+
+    start = time.perf_counter()
+    start_warmup().wait()
+    warm_every_input()
+    print(f'Figures ({CACHE_TYPE}): {time.perf_counter() - start:.2f}s')
+    if CACHE_TYPE == 'SimpleCache':
+        print('Warning: SimpleCache is in-memory, so no figures were persisted; use FileSystemCache')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Measure resident memory per gunicorn worker for several worker counts (Linux only).
+
+Run from the klimainsights directory:
+
+    python -m tools.worker_rss --workers 1,4,8 --duration 20
+    python -m tools.worker_rss --command "gunicorn index:server -b 127.0.0.1:{port} --workers={workers} --preload"
+
+For each worker count a fresh server is started, driven with the load test sessions so every worker has
+imported the pages and served callbacks, and then /proc/<pid>/smaps_rollup is read for every worker.
+RSS counts shared pages (such as the memory-mapped dataset store) in every worker; PSS splits them
+between the processes mapping them, so the PSS total is what the host actually pays.
+"""
+import argparse
+import json
+import shlex
+import statistics
+import subprocess
+import time
+from pathlib import Path
+
+from tools.coldstart import free_port, wait_for
+from tools.loadtest import run_stage
+
+DEFAULT_COMMAND = 'gunicorn index:server -b 127.0.0.1:{port} --workers={workers}'
+FIELDS = {'Rss': 'rss', 'Pss': 'pss', 'Shared_Clean': 'shared', 'Shared_Dirty': 'shared',
+          'Private_Clean': 'private', 'Private_Dirty': 'private'}
+MB = 1024  # smaps_rollup reports kB
+
+def smaps_rollup(pid):
+    """RSS, PSS, shared and private memory of a process in kB."""
+    usage = dict.fromkeys(set(FIELDS.values()), 0)
+    for line in Path(f'/proc/{pid}/smaps_rollup').read_text().splitlines()[1:]:
+        field, value = line.split(':')
+        if field in FIELDS:
+            usage[FIELDS[field]] += int(value.split()[0])
+    return usage
+
+def children(pid):
+    return [int(child) for child in Path(f'/proc/{pid}/task/{pid}/children').read_text().split()]
+
+def measure(command, workers, duration, users, timeout):
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(shlex.split(command.format(port=port, workers=workers)),
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for(f'http://127.0.0.1:{port}/_ready', start, start + timeout)
+        run_stage('127.0.0.1', port, users or 2 * workers, duration, ramp=0, think_time=0.2)
+        worker_pids = children(process.pid)
+        master = smaps_rollup(process.pid)
+        per_worker = [smaps_rollup(pid) for pid in worker_pids]
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {
+        'workers': len(per_worker),
+        'master': master,
+        'per_worker': per_worker,
+        'mean_rss_mb': statistics.mean(w['rss'] for w in per_worker) / MB,
+        'mean_pss_mb': statistics.mean(w['pss'] for w in per_worker) / MB,
+        'mean_private_mb': statistics.mean(w['private'] for w in per_worker) / MB,
+        'total_pss_mb': (master['pss'] + sum(w['pss'] for w in per_worker)) / MB,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', default='1,4,8', help='Comma-separated worker counts')
+    parser.add_argument('--command', default=DEFAULT_COMMAND, help='Server command; {port} and {workers} are replaced')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds of load per worker count')
+    parser.add_argument('--users', type=int, help='Virtual users per run (default: two per worker)')
+    parser.add_argument('--timeout', type=float, default=300, help='Seconds to wait for the server to become ready')
+    parser.add_argument('--json', help='Write the full report to this file')
+    args = parser.parse_args()
+
+    report = []
+    print(f'{"workers":>7} {"RSS/worker MB":>14} {"PSS/worker MB":>14} {"private/worker MB":>18} {"total PSS MB":>13}')
+    for workers in [int(n) for n in args.workers.split(',')]:
+        row = measure(args.command, workers, args.duration, args.users, args.timeout)
+        report.append(row)
+        print(f'{row["workers"]:>7} {row["mean_rss_mb"]:>14.1f} {row["mean_pss_mb"]:>14.1f} '
+              f'{row["mean_private_mb"]:>18.1f} {row["total_pss_mb"]:>13.1f}')
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+# Adaptive Choropleth Rendering
+# Layers within the feature budget are always drawn as full polygons. Larger layers (municipality or
+# barangay level) are drawn as dissolved parent polygons or WebGL centroid markers when zoomed out, and
+# switch to full polygons for the features inside the visible viewport once zoomed in.
+import math
+import plotly.express as px
+import plotly.graph_objects as go
+from shapely.geometry import mapping
+from pandas.api.types import is_numeric_dtype
+from environment.settings import MAP_FEATURE_BUDGET, MAP_ZOOM_THRESHOLD
+from utils.basemap import apply_basemap
+
+DEFAULT_ZOOM = 5
+DEFAULT_CENTER = {"lat": 12.8797, "lon": 122.7740}
+
+_aggregates = {}
+_centroids = {}
+
+def fits_budget(gdf):
+    return len(gdf) <= MAP_FEATURE_BUDGET
+
+def moved(relayout_data):
+    """Whether a relayoutData pans or zooms the map, rather than only e.g. autosizing it."""
+    return any(key.startswith('mapbox.') for key in relayout_data or {})
+
+def viewport(relayout_data, zoom=DEFAULT_ZOOM, center=DEFAULT_CENTER):
+    """Read zoom, center and (lon_min, lat_min, lon_max, lat_max) bounds from a mapbox relayoutData."""
+    relayout_data = relayout_data or {}
+    zoom = relayout_data.get('mapbox.zoom', zoom)
+    center = relayout_data.get('mapbox.center', center)
+    corners = relayout_data.get('mapbox._derived', {}).get('coordinates')
+    if corners:
+        lons = [lon for lon, lat in corners]
+        lats = [lat for lon, lat in corners]
+        bounds = (min(lons), min(lats), max(lons), max(lats))
+    else:
+        # Approximate a ~1000px wide map: 256px tiles cover 360 / 2**zoom degrees
+        half_span = 360 / 2 ** zoom * 2
+        bounds = (center['lon'] - half_span, center['lat'] - half_span / 2,
+                  center['lon'] + half_span, center['lat'] + half_span / 2)
+    return zoom, center, bounds
+
+def dissolved_geometry(gdf, parent):
+    key = (id(gdf), parent)
+    if key not in _aggregates:
+        dissolved = gdf[[parent, 'geometry']].dissolve(by=parent).reset_index()
+        dissolved['geometry'] = dissolved.geometry.simplify(0.01)
+        _aggregates[key] = (gdf, dissolved)
+    return _aggregates[key][1]
+
+def aggregate(gdf, attributes, parent, columns, aggfunc):
+    totals = attributes.groupby(parent)[columns].agg(aggfunc)
+    return dissolved_geometry(gdf, parent).merge(totals, left_on=parent, right_index=True)
+
+def attach(gdf, data, values):
+    """Join attribute columns held outside the geometry frame (e.g. a SharedTable) onto the rows of gdf in data."""
+    if values is None:
+        return data
+    rows = gdf.index.get_indexer(data.index)
+    return data.assign(**{col: values[col].to_numpy()[rows] for col in values.columns if col not in data})
+
+def centroids(gdf):
+    if id(gdf) not in _centroids:
+        points = gdf.geometry.representative_point()
+        _centroids[id(gdf)] = (gdf, points.y.values, points.x.values)
+    return _centroids[id(gdf)][1:]
+
+def render_plan(gdf, zoom, bounds, parent=None):
+    """Pick 'polygons', 'aggregate' or 'markers' for a layer at the given viewport."""
+    if fits_budget(gdf):
+        return 'polygons', gdf
+    if zoom >= MAP_ZOOM_THRESHOLD:
+        lon_min, lat_min, lon_max, lat_max = bounds
+        visible = gdf.cx[lon_min:lon_max, lat_min:lat_max]
+        return ('polygons' if fits_budget(visible) else 'markers'), visible
+    if parent is not None and gdf[parent].nunique() <= MAP_FEATURE_BUDGET:
+        return 'aggregate', gdf
+    return 'markers', gdf
+
+def adaptive_choropleth(gdf, color, customdata, relayout_data=None, parent=None, aggfunc='sum', values=None,
+                        hovertemplate=None, aggregate_hover=None, **kwargs):
+    """Build a choropleth_mapbox, or its aggregated/marker stand-in, sized to the current viewport.
+
+    Columns missing from gdf are read from values, a DataFrame aligned row by row with gdf. aggregate_hover
+    is a (customdata, hovertemplate) pair used instead when the layer is drawn as dissolved parents, for
+    columns (ranks, intervals) that mean nothing once aggregated.
+    """
+    zoom, center, bounds = viewport(relayout_data, kwargs.pop('zoom', DEFAULT_ZOOM), kwargs.pop('center', DEFAULT_CENTER))
+    mode, data = render_plan(gdf, zoom, bounds, parent)
+
+    if mode == 'aggregate' and aggregate_hover is not None:
+        customdata, hovertemplate = aggregate_hover
+    if mode == 'aggregate':
+        attributes = attach(gdf, gdf.drop(columns='geometry'), values)
+        numeric = [col for col in dict.fromkeys([color, *customdata]) if col != parent and is_numeric_dtype(attributes[col])]
+        data = aggregate(gdf, attributes, parent, numeric, aggfunc)
+        if aggfunc == 'sum' and 'range_color' in kwargs:
+            # Summed parents outgrow the per-feature colour range, so scale the colours to the parents
+            kwargs['range_color'] = [float(data[color].min()), float(data[color].max())]
+        # Label columns (e.g. the province name) fall back to the parent they were dissolved into
+        data = data.assign(**{col: data[parent] for col in customdata if col not in data})
+    else:
+        data = attach(gdf, data, values)
+
+    if mode == 'markers':
+        lat, lon = centroids(gdf)
+        mask = gdf.index.isin(data.index)
+        fig = px.scatter_mapbox(data, lat=lat[mask], lon=lon[mask], color=color,
+                                zoom=zoom, center=center, **kwargs)
+        fig.update_traces(marker=dict(size=6))
+    else:
+        fig = px.choropleth_mapbox(data,
+                                   geojson=data.geometry,
+                                   locations=data.index,
+                                   color=color,
+                                   zoom=zoom,
+                                   center=center,
+                                   **kwargs)
+    apply_basemap(fig)
+    # Keep the user's pan/zoom when the figure is re-rendered for a new viewport
+    fig.update_layout(uirevision='adaptive-map')
+    fig.update_traces(customdata=data[customdata])
+    if hovertemplate is not None:
+        fig.update_traces(hovertemplate=hovertemplate)
+    return fig
+
+def focus_province(fig, geometry):
+    """A copy of a map figure centred on one province, with the province outlined on top."""
+    fig = go.Figure(fig)
+    lon_min, lat_min, lon_max, lat_max = geometry.bounds
+    span = max(lon_max - lon_min, lat_max - lat_min, 0.05)
+    fig.add_trace(go.Choroplethmapbox(geojson={'type': 'FeatureCollection', 'features': [{'type': 'Feature', 'id': 0, 'geometry': mapping(geometry)}]},
+                                      locations=[0], z=[0],
+                                      colorscale=[[0, 'rgba(0, 0, 0, 0)'], [1, 'rgba(0, 0, 0, 0)']], showscale=False,
+                                      marker_line_color='#b58900', marker_line_width=3, hoverinfo='skip'))
+    fig.update_layout(mapbox_center={'lat': (lat_min + lat_max) / 2, 'lon': (lon_min + lon_max) / 2},
+                      mapbox_zoom=min(10, max(DEFAULT_ZOOM, math.log2(360 / span) - 1)))
+    return fig
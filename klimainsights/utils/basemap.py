@@ -0,0 +1,68 @@
+# Basemap
+# By default every map draws on Mapbox's streets style, which needs MAPBOX_TOKEN and a round trip to the
+# tile service on each render. MAP_BASEMAP switches every map to a basemap the app serves itself, so the
+# dashboard can be benchmarked and run fully offline:
+#   tiles    raster tiles from MAP_TILES_DIR/{z}/{x}/{y}.png (e.g. an exported OpenStreetMap extract)
+#   outline  a land outline dissolved from the province polygons, drawn on white
+#   blank    a plain white background
+import hashlib
+import json
+import os
+
+import shapely
+from flask import Response, request, send_from_directory
+from shapely.geometry import mapping
+
+from environment.settings import MAP_BASEMAP, MAPBOX_STYLE, MAP_TILES_DIR, MAP_TILES_MAX_AGE
+from utils.datasets import read_dataset
+
+TILE_URL = '/tiles/{z}/{x}/{y}.png'
+OUTLINE_URL = '/tiles/outline.geojson'
+
+_outline = {}
+
+def basemap_layout():
+    """Layout properties of layout.mapbox for the configured basemap."""
+    if MAP_BASEMAP == 'tiles':
+        return {'style': 'white-bg',
+                'layers': [{'below': 'traces', 'sourcetype': 'raster', 'source': [TILE_URL],
+                            'sourceattribution': '© OpenStreetMap contributors'}]}
+    if MAP_BASEMAP == 'outline':
+        return {'style': 'white-bg',
+                'layers': [{'below': 'traces', 'sourcetype': 'geojson', 'source': OUTLINE_URL,
+                            'type': 'fill', 'color': '#e8e4d8'},
+                           {'below': 'traces', 'sourcetype': 'geojson', 'source': OUTLINE_URL,
+                            'type': 'line', 'color': '#93a1a1', 'line': {'width': 1}}]}
+    if MAP_BASEMAP == 'blank':
+        return {'style': 'white-bg'}
+    return {'style': MAPBOX_STYLE}
+
+def apply_basemap(fig):
+    fig.update_layout(mapbox=basemap_layout())
+    return fig
+
+def outline_geojson():
+    """The land outline as GeoJSON, dissolved and simplified from the province polygons once."""
+    if 'body' not in _outline:
+        land = shapely.union_all(read_dataset('temperature').geometry.to_numpy()).simplify(0.005)
+        _outline['body'] = json.dumps({'type': 'FeatureCollection',
+                                       'features': [{'type': 'Feature', 'properties': {}, 'geometry': mapping(land)}]})
+        _outline['etag'] = hashlib.sha1(_outline['body'].encode()).hexdigest()
+    return _outline
+
+def register_basemap_routes(server):
+    @server.route('/tiles/<int:z>/<int:x>/<int:y>.png')
+    def tile(z, x, y):
+        # send_from_directory answers If-Modified-Since / If-None-Match with 304
+        return send_from_directory(os.path.abspath(MAP_TILES_DIR), f'{z}/{x}/{y}.png', max_age=MAP_TILES_MAX_AGE)
+
+    @server.route(OUTLINE_URL)
+    def outline():
+        body = outline_geojson()
+        if body['etag'] in request.if_none_match:
+            response = Response(status=304)
+        else:
+            response = Response(body['body'], mimetype='application/geo+json')
+        response.set_etag(body['etag'])
+        response.headers['Cache-Control'] = f'public, max-age={MAP_TILES_MAX_AGE}'
+        return response
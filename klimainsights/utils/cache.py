@@ -0,0 +1,11 @@
+import inspect
+
+from flask_caching import Cache
+
+# Initialized against the Flask server in app.py before Dash imports the pages
+cache = Cache()
+
+def viewport_dependent(f, *args, **kwargs):
+    """unless= hook for memoized map figures: figures built for a panned or zoomed viewport are never cached,
+    since every relayoutData (float centre, zoom and corners) would store a new figure and evict the rest."""
+    return inspect.signature(f).bind(*args, **kwargs).arguments.get('relayout_data') is not None
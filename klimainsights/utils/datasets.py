@@ -0,0 +1,35 @@
+# Dataset Loading
+# GeoJSON parsing dominates import time, so tools/prebuild.py converts each file to GeoParquet under
+# data/artifacts/. Pages read the parquet copy whenever it is at least as new as its GeoJSON source.
+from pathlib import Path
+import pandas as pd
+import geopandas as gpd
+
+datasets_folder = Path('./data')
+artifacts_folder = datasets_folder / 'artifacts'
+
+def parquet_path(name):
+    return artifacts_folder / f'{name}.parquet'
+
+def read_dataset(name):
+    source = datasets_folder / f'{name}.geojson'
+    prebuilt = parquet_path(name)
+    if prebuilt.exists() and prebuilt.stat().st_mtime >= source.stat().st_mtime:
+        return gpd.read_parquet(prebuilt)
+    return gpd.read_file(source)
+
+def prebuild_dataset(name):
+    artifacts_folder.mkdir(parents=True, exist_ok=True)
+    gpd.read_file(datasets_folder / f'{name}.geojson').to_parquet(parquet_path(name))
+    return parquet_path(name)
+
+def melt_temperature(temperature_gdf):
+    """One row per province and decade with its average temperature ('value') and change since the 1960s ('TempDiff')."""
+    id_vars = ['name', 'admin_div', 'island_group', 'Region']
+    melt_value = temperature_gdf.drop(columns=[col for col in temperature_gdf.columns if 'TempDiff' in col or col == 'geometry'])
+    melt_value.columns = [col.split('_')[0] if '_value' in col else col for col in melt_value.columns]
+    melt_value = melt_value.melt(id_vars=id_vars, var_name='decade', value_name='value')
+    melt_tempdiff = temperature_gdf.drop(columns=[col for col in temperature_gdf.columns if 'value' in col or col == 'geometry'])
+    melt_tempdiff.columns = [col.split('_')[0] if '_TempDiff' in col else col for col in melt_tempdiff.columns]
+    melt_tempdiff = melt_tempdiff.melt(id_vars=id_vars, var_name='decade', value_name='TempDiff')
+    return pd.merge(melt_value, melt_tempdiff, on=[*id_vars, 'decade'])
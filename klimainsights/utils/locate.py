@@ -0,0 +1,111 @@
+# Find My Location
+# A navbar search that takes a latitude and longitude, typed in or read from the browser's geolocation,
+# finds the province holding it with the spatial index and links to that province on every page. Pages
+# read the province from the ?province= query parameter of their layout.
+from urllib.parse import quote
+
+from dash import html, dcc, callback, clientside_callback, ctx, no_update, Output, Input, State, ALL
+import dash_bootstrap_components as dbc
+
+from utils.datasets import read_dataset
+from utils.spatial import ProvinceIndex
+
+# The index keeps only the geometries and a few labels, not the dataset
+province_index = ProvinceIndex(read_dataset('temperature'))
+
+PAGES = {'/temperature': 'Temperature', '/disaster': 'Disasters', '/biodiversity': 'Biodiversity'}
+
+def location_search():
+    return dbc.NavItem(children=[
+        dbc.Button("Find My Location", color="secondary", className="ms-2", id="open-locate-modal", n_clicks=0),
+        dbc.Modal(
+            [
+                dbc.ModalHeader(dbc.ModalTitle(className="text-secondary", children=["Find My Location"])),
+                dbc.ModalBody(className="text-light", children=[
+                    html.P(children=[
+                        "Enter a latitude and longitude, or let the browser share your location, to see the temperature, disaster and biodiversity records of the province you are in."
+                    ]),
+                    dbc.Row(className="g-2", children=[
+                        dbc.Col(dbc.Input(id="locate-lat", type="number", placeholder="Latitude (e.g. 14.5995)", min=-90, max=90, step="any")),
+                        dbc.Col(dbc.Input(id="locate-lon", type="number", placeholder="Longitude (e.g. 120.9842)", min=-180, max=180, step="any")),
+                    ]),
+                    html.Div(className="d-flex justify-content-center my-3 flex-gap-20", children=[
+                        dbc.Button("Search", color="primary", id="locate-search", n_clicks=0),
+                        dbc.Button("Use My Location", color="primary", outline=True, id="locate-geo-button", n_clicks=0),
+                    ]),
+                    dcc.Store(id="locate-geo"),
+                    dcc.Loading(type="circle", children=[html.Div(id="locate-result")])
+                ]),
+            ],
+            id="locate-modal",
+            is_open=False,
+        )
+    ])
+
+def location_result(province):
+    name = province['name']
+    note = " (nearest province; the point is just outside its boundary)" if province['nearest'] else ""
+    return html.Div(className="text-center", children=[
+        html.H4(className="mt-2", children=[name]),
+        html.P(children=[f"{province['Region']}, {province['island_group']}{note}"]),
+        html.Div(className="d-flex justify-content-center flex-gap-20", children=[
+            dbc.Button(label, color="primary", href=f"{path}?province={quote(name)}",
+                       id={'type': 'locate-link', 'index': path}, n_clicks=0)
+            for path, label in PAGES.items()
+        ])
+    ])
+
+# Modal, closed again once one of the result links is followed
+@callback(
+    Output("locate-modal", "is_open"),
+    Input("open-locate-modal", "n_clicks"),
+    Input({'type': 'locate-link', 'index': ALL}, "n_clicks"),
+    State("locate-modal", "is_open"),
+)
+def toggle_locate_modal(n1, link_clicks, is_open):
+    # The links also fire this callback when a result mounts them, before anyone has clicked
+    if isinstance(ctx.triggered_id, dict):
+        return False if any(link_clicks) else no_update
+    if n1:
+        return not is_open
+    return is_open
+
+# Browser Geolocation
+clientside_callback(
+    """
+    function(n_clicks) {
+        if (!navigator.geolocation) {
+            return 'Location is not available in this browser.';
+        }
+        navigator.geolocation.getCurrentPosition(
+            (position) => window.dash_clientside.set_props('locate-geo', {data: {lat: position.coords.latitude, lon: position.coords.longitude}}),
+            (error) => window.dash_clientside.set_props('locate-result', {children: 'Could not read your location: ' + error.message})
+        );
+        return 'Locating...';
+    }
+    """,
+    Output("locate-result", "children", allow_duplicate=True),
+    Input("locate-geo-button", "n_clicks"),
+    prevent_initial_call=True
+)
+
+# Lookup
+@callback(
+    Output("locate-result", "children"),
+    Output("locate-lat", "value"),
+    Output("locate-lon", "value"),
+    Input("locate-search", "n_clicks"),
+    Input("locate-geo", "data"),
+    State("locate-lat", "value"),
+    State("locate-lon", "value"),
+    prevent_initial_call=True
+)
+def find_location(n_clicks, geo, lat, lon):
+    if ctx.triggered_id == 'locate-geo' and geo:
+        lat, lon = geo['lat'], geo['lon']
+    if lat is None or lon is None:
+        return "Enter both a latitude and a longitude.", lat, lon
+    province = province_index.locate(lat, lon)
+    if province is None:
+        return f"No province found near {lat:.4f}, {lon:.4f}.", lat, lon
+    return location_result(province), lat, lon
@@ -0,0 +1,82 @@
+# Metric Registry
+# Every value a metric dropdown can take, per group: the column it reads, its labels, colour scale and
+# colour range. Callbacks resolve their dropdown value with one dict lookup instead of branching on it,
+# colour ranges are precomputed from the data when a page loads, and the warm-up layer enumerates every
+# valid input from the same table. Adding a disaster type or decade is one more row here.
+import numpy as np
+
+DECADES = ['1960s', '1970s', '1980s', '1990s', '2000s', '2010s', '2020s']
+ISLAND_GROUPS = ['Luzon', 'Visayas', 'Mindanao']
+TEMPSCALE = [
+    [0, 'blue'],
+    [0.75, 'red'],
+    [1, 'rgb(255, 96, 96)']
+]
+
+METRICS = {}
+
+def register(group, metric_id, column, label, **spec):
+    METRICS.setdefault(group, {})[metric_id] = {'id': metric_id, 'column': column, 'label': label, **spec}
+
+def resolve(group, metric_id):
+    """The metric spec for a dropdown value, or None when the group does not define it."""
+    return METRICS.get(group, {}).get(metric_id)
+
+def metric_ids(group):
+    return list(METRICS[group])
+
+def group_metrics(group):
+    return list(METRICS[group].values())
+
+def set_ranges(group, table, by=None):
+    """Precompute the colour range of every metric in group without a fixed one, overall or per value of `by`.
+
+    table is a DataFrame or SharedTable holding the metric columns. A metric's 'range_floor' is always
+    inside its range: the lower end extends down to it when the data stay above it (e.g. 0, so warming
+    rates always start from no warming), and lower values are kept.
+    """
+    keys = np.asarray(table[by]) if by else None
+    for spec in group_metrics(group):
+        if spec.get('fixed_range'):
+            continue
+        values = np.asarray(table[spec['column']], dtype=float)
+        if by:
+            spec['ranges'] = {key: value_range(values[keys == key], spec) for key in np.unique(keys)}
+        else:
+            spec['range'] = value_range(values, spec)
+
+def value_range(values, spec):
+    low, high = float(np.nanmin(values)), float(np.nanmax(values))
+    if 'range_floor' in spec:
+        low = min(spec['range_floor'], low)
+    return [low, high]
+
+# Temperature map: one metric per decade, plus the warming-rate trend
+for decade in DECADES:
+    register('temperature', f'{decade}_value', f'{decade}_value', decade,
+             colorscale=TEMPSCALE, range=[25, 33], fixed_range=True)
+register('temperature', 'warming_rate', 'slope', 'Warming Rate', colorscale='reds', range_floor=0)
+
+# Disasters: one metric per disaster type for each division. Region columns hold the region's total on
+# every province row and are derived from the province column ('source') by pages/disaster.py.
+DISASTER_TYPES = [
+    ('Total Disaster', 'Total Disaster Count', 'Region_tot'),
+    ('Storm', 'Storm Count', 'Region_storm'),
+    ('Flood', 'Flood Count', 'Region_flood'),
+    ('Earthquake', 'Earthquake Count', 'Region_earth'),
+    ('Volcanic Activity', 'Volcanic Activity Count', 'Region_vol'),
+    ('Mass Movement', 'Mass Movement Count', 'Region_mass'),
+    ('Drought', 'Drought Count', 'Region_drought'),
+]
+for disaster_type, province_column, region_column in DISASTER_TYPES:
+    register('disaster/Province', disaster_type, province_column, disaster_type,
+             division_column='Area Name', colorscale='amp')
+    register('disaster/Region', disaster_type, region_column, disaster_type,
+             division_column='Region', source=province_column, colorscale='amp')
+
+# Biodiversity: species counts per IUCN category, with colour ranges per island group
+for metric_id, label, short_label in [('total_species', 'Total', 'Total'),
+                                      ('Critical', 'Critically Endangered', 'Critical'),
+                                      ('Endangered', 'Endangered', 'Endangered'),
+                                      ('Vulnerable', 'Vulnerable', 'Vulnerable')]:
+    register('biodiversity', metric_id, metric_id, label, short_label=short_label, colorscale='dense')
@@ -0,0 +1,101 @@
+# Predictive Prefetch
+# Visitors go from the landing card to /temperature and then follow the navbar, so while a page is
+# being read the figures of the page(s) most likely to come next are built into the figure cache in a
+# background thread. Their layouts and first callbacks then read warm cache entries on navigation.
+#
+# Pages take part through two optional module-level hooks:
+#   prefetch()     builds the figures a visitor sees first on the page (its layout and initial callbacks)
+#   warm_inputs()  yields (function, args) for every valid input combination, enumerated from the
+#                  metric registry, for the full warm-up (PREFETCH_ALL_INPUTS and tools.prebuild)
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+
+from dash import callback, page_registry, Output, Input
+from environment.settings import PREFETCH_ALL_INPUTS, CACHE_DEFAULT_TIMEOUT
+
+NEXT_PAGES = {
+    '/': ['/temperature'],
+    '/temperature': ['/biodiversity', '/disaster'],
+    '/biodiversity': ['/disaster'],
+    '/disaster': ['/temperature'],
+}
+
+def warm_pages(paths):
+    for page in page_registry.values():
+        prefetch = getattr(sys.modules.get(page['module']), 'prefetch', None)
+        if page['path'] in paths and prefetch is not None:
+            try:
+                prefetch()
+            except Exception:
+                logging.exception('Prefetching %s failed', page['path'])
+
+def warm_every_input():
+    """Build the figure of every valid input combination each page enumerates in warm_inputs()."""
+    for page in page_registry.values():
+        warm_inputs = getattr(sys.modules.get(page['module']), 'warm_inputs', None)
+        for func, args in (warm_inputs() if warm_inputs is not None else []):
+            try:
+                func(*args)
+            except Exception:
+                logging.exception('Warming %s%s failed', func.__name__, args)
+
+# One worker thread per process builds the queued pages in turn. A page is queued again only once its
+# figures may have expired from the cache, so concurrent visitors never build the same figures twice.
+_prefetch = {'pid': None, 'queue': None, 'queued': {}}
+_prefetch_lock = threading.Lock()
+
+def prefetch_worker(pending):
+    while True:
+        warm_pages([pending.get()])
+
+def queue_prefetch(paths):
+    now = time.monotonic()
+    with _prefetch_lock:
+        if _prefetch['pid'] != os.getpid():
+            _prefetch.update(pid=os.getpid(), queue=queue.Queue(), queued={})
+            threading.Thread(target=prefetch_worker, args=(_prefetch['queue'],), daemon=True).start()
+        queued = _prefetch['queued']
+        for path in paths:
+            if path not in queued or (CACHE_DEFAULT_TIMEOUT and now - queued[path] > CACHE_DEFAULT_TIMEOUT):
+                queued[path] = now
+                _prefetch['queue'].put(path)
+
+@callback(
+    Output('prefetch-store', 'data'),
+    Input('url', 'pathname')
+)
+def prefetch_next_pages(pathname):
+    paths = NEXT_PAGES.get(pathname, [])
+    if paths:
+        queue_prefetch(paths)
+    return paths
+
+# Readiness
+# Every worker warms all pages once at startup; /_ready answers 503 until that is done. The warm-up is
+# tracked per process id because gunicorn --preload forks workers after the app has been imported.
+_warmup = {'pid': None, 'done': None}
+
+def warm_all_pages(done):
+    warm_pages(list(NEXT_PAGES))
+    done.set()
+    # Only worth it with a cache shared between workers, since every figure is kept
+    if PREFETCH_ALL_INPUTS:
+        warm_every_input()
+
+def start_warmup():
+    if _warmup['pid'] != os.getpid():
+        _warmup['pid'] = os.getpid()
+        _warmup['done'] = threading.Event()
+        threading.Thread(target=warm_all_pages, args=(_warmup['done'],), daemon=True).start()
+    return _warmup['done']
+
+def register_readiness_route(server):
+    @server.route('/_ready')
+    def ready():
+        if start_warmup().is_set():
+            return {'status': 'ready'}
+        return {'status': 'warming'}, 503
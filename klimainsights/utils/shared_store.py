@@ -0,0 +1,103 @@
+# Shared Columnar Store
+# Attribute tables are written once as one .npy file per column and opened with mmap, so every gunicorn
+# worker maps the same page-cache pages instead of holding its own pandas copy. Refcounting only ever
+# touches the small ndarray headers, never the mapped data, so the pages stay shared after fork. Pages
+# open their attribute tables here at import and keep only geometry and labels in their GeoDataFrames.
+# Numeric and boolean columns are stored as they are; text columns as int32 codes plus a list of
+# categories, with -1 for missing values.
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from utils.datasets import artifacts_folder
+
+store_folder = artifacts_folder / 'store'
+# Part of every store's folder name, so stores written in an older layout are rebuilt
+STORE_FORMAT = 2
+
+_tables = {}
+
+def source_hash(frame):
+    return hashlib.sha1(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes()).hexdigest()[:12]
+
+def write_table(path, frame):
+    manifest = {'rows': len(frame), 'columns': {}}
+    for col in frame.columns:
+        file_name = f'{len(manifest["columns"])}.npy'
+        if pd.api.types.is_numeric_dtype(frame[col]):
+            np.save(path / file_name, frame[col].to_numpy())
+            manifest['columns'][col] = {'file': file_name}
+        else:
+            codes, categories = pd.factorize(frame[col])
+            np.save(path / file_name, codes.astype(np.int32))
+            manifest['columns'][col] = {'file': file_name, 'categories': categories.tolist()}
+    with open(path / 'manifest.json', 'w') as f:
+        json.dump(manifest, f)
+
+def open_table(name, source, build):
+    """Open the store for `name`, writing build() into it first if `source` changed since it was built."""
+    path = store_folder / f'{name}-v{STORE_FORMAT}-{source_hash(source)}'
+    if not path.exists():
+        store_folder.mkdir(parents=True, exist_ok=True)
+        # Build in a scratch folder and rename, so workers starting together never read a partial store
+        scratch = tempfile.mkdtemp(dir=store_folder)
+        write_table(Path(scratch), build())
+        try:
+            os.rename(scratch, path)
+        except OSError:
+            shutil.rmtree(scratch, ignore_errors=True)
+    # Pages reading the same table share one set of mappings
+    if path not in _tables:
+        _tables[path] = SharedTable(path)
+    return _tables[path]
+
+class SharedTable:
+    """Read-only, memory-mapped columns with just enough of a DataFrame's API for the callbacks."""
+
+    def __init__(self, path):
+        with open(path / 'manifest.json') as f:
+            manifest = json.load(f)
+        self.path = path
+        self.rows = manifest['rows']
+        self.columns = list(manifest['columns'])
+        self._data = {}
+        self._categories = {}
+        for col, spec in manifest['columns'].items():
+            self._data[col] = np.load(path / spec['file'], mmap_mode='r')
+            if 'categories' in spec:
+                # A trailing None, so the missing-value code -1 decodes to None
+                self._categories[col] = np.array([*spec['categories'], None], dtype=object)
+
+    def __len__(self):
+        return self.rows
+
+    @property
+    def nbytes(self):
+        return sum(array.nbytes for array in self._data.values())
+
+    def __getitem__(self, col):
+        return self.column(col)
+
+    def column(self, col, rows=None):
+        values = self._data[col] if rows is None else self._data[col][rows]
+        if col in self._categories:
+            return self._categories[col][values]
+        return np.array(values)
+
+    def isin(self, col, values):
+        """Boolean row mask, compared on the stored codes for text columns."""
+        if col in self._categories:
+            codes = np.flatnonzero(np.isin(self._categories[col][:-1], list(values)))
+            return np.isin(self._data[col], codes)
+        return np.isin(self._data[col], list(values))
+
+    def frame(self, columns=None, rows=None):
+        """Copy the selected rows (index array, boolean mask or slice) of some columns into a DataFrame."""
+        columns = self.columns if columns is None else columns
+        return pd.DataFrame({col: self.column(col, rows) for col in columns})
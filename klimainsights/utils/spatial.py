@@ -0,0 +1,29 @@
+# Province Lookup
+# An STRtree over the province polygons, built once when the app loads, finds the province containing a
+# coordinate (or the nearest one, for points just off the coast) by testing only the few polygons whose
+# bounding boxes hold the point, so a lookup stays well under a millisecond at municipality level too.
+import shapely
+from shapely import STRtree
+
+# Points further than this from every province (in degrees, about 55 km) are treated as outside the map
+MAX_NEAREST_DISTANCE = 0.5
+
+class ProvinceIndex:
+    def __init__(self, gdf, columns=('name', 'Region', 'island_group')):
+        self.geometries = gdf.geometry.to_numpy()
+        shapely.prepare(self.geometries)
+        self.tree = STRtree(self.geometries)
+        self.records = gdf[list(columns)].to_dict('records')
+
+    def locate(self, lat, lon):
+        """The record of the province containing (lat, lon), else of the nearest one, else None."""
+        point = shapely.Point(lon, lat)
+        # Bounding-box candidates from the tree, then an exact test against the prepared polygons
+        candidates = self.tree.query(point)
+        hits = candidates[shapely.intersects(self.geometries[candidates], point)]
+        if len(hits):
+            return {**self.records[hits.min()], 'nearest': False}
+        nearest = self.tree.query_nearest(point, max_distance=MAX_NEAREST_DISTANCE)
+        if len(nearest):
+            return {**self.records[nearest.min()], 'nearest': True}
+        return None